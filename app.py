@@ -3,13 +3,21 @@ import pandas as pd
 import requests
 from bs4 import BeautifulSoup
 import re
-from openai import OpenAI
+import openai
 import os
 from datetime import datetime
 import time
 import json
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from concurrent.futures import TimeoutError as FutureTimeout
+from utils.llm import chat_completion, PRIORITY_INTERACTIVE, INTERACTIVE_TIMEOUT
+from utils.history import get_history_store, get_chat_identity, render_history, llm_summarizer, extractive_summary
+from utils.fetch import resilient_cache, stale_message, SOURCE_BUDGETS
+from utils.router import route_question
+from utils.portfolio import load_closes, align_closes, compute_risk
+from utils.ticker import (get_quote_feed, nse_symbol, render_live_metric, render_live_chart, record_cpu,
+                          cpu_caption, LIVE_INTERVAL)
 
 # --- Setup ---
 st.set_page_config(
@@ -17,6 +25,7 @@ st.set_page_config(
     layout="wide",
     page_icon="📊"
 )
+run_started = time.thread_time()
 
 # Initialize OpenAI
 api_key = os.getenv("OPENAI_API_KEY")
@@ -39,6 +48,8 @@ def format_number(text):
         return text
 
 
+@resilient_cache("screener", ttl=60*15, cache_if=lambda r: not r.get("error"),
+                 fallback=lambda ticker: {"error": f"Screener.in is not responding for {ticker}. Please try again shortly."})
 def get_screener_data(ticker):
     """Get stock data from Screener.in"""
     try:
@@ -68,8 +79,7 @@ def get_screener_data(ticker):
             'Cache-Control': 'max-age=0',
         }
 
-        time.sleep(2)
-        response = session.get(url, headers=headers, timeout=15)
+        response = session.get(url, headers=headers, timeout=SOURCE_BUDGETS["screener"])
 
         # -- DEBUGGING OUTPUT --
         print(f"Request status code: {response.status_code}")
@@ -78,6 +88,8 @@ def get_screener_data(ticker):
         # --- HERE IS THE FIX ---
         soup = BeautifulSoup(response.text, 'html.parser')
 
+        if response.status_code >= 500:
+            response.raise_for_status()
         if response.status_code != 200:
             return {"error": f"Could not fetch data for ticker {ticker}. Status code: {response.status_code}"}
 
@@ -171,29 +183,25 @@ def get_screener_data(ticker):
             "error": None
         }
 
+    except requests.RequestException:
+        # Timeouts, connection errors and 5xx count against the breaker
+        raise
     except Exception as e:
         return {"error": f"Error fetching data for {ticker}: {str(e)}"}
 
 
+@resilient_cache("screener_search", ttl=60*60, fallback=lambda query: [])
 def get_screener_search(query):
     """Search stocks on Screener.in"""
-    try:
-        url = f"https://www.screener.in/api/company/search/?q={query}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'X-Requested-With': 'XMLHttpRequest'
-        }
-
-        response = requests.get(url, headers=headers, timeout=5)
+    url = f"https://www.screener.in/api/company/search/?q={query}"
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'X-Requested-With': 'XMLHttpRequest'
+    }
 
-        if response.status_code != 200:
-            return []
-
-        data = response.json()
-        return data
-    except Exception as e:
-        st.error(f"Search error: {str(e)}")
-        return []
+    response = requests.get(url, headers=headers, timeout=SOURCE_BUDGETS["screener_search"])
+    response.raise_for_status()
+    return response.json()
 
 
 def get_popular_stocks():
@@ -220,64 +228,37 @@ def get_major_indices():
     ]
 
 
+@resilient_cache("economictimes", ttl=60*10, cache_if=bool, fallback=lambda: [])
 def get_financial_news():
-    """Get financial news from economic times or moneycontrol"""
-    try:
-        # Try Economic Times
-        url = "https://economictimes.indiatimes.com/markets/stocks/news"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+    """Get financial news from Economic Times, falling back to the last headlines fetched"""
+    url = "https://economictimes.indiatimes.com/markets/stocks/news"
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
 
-        response = requests.get(url, headers=headers, timeout=10)
-
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            news_items = []
-
-            news_elements = soup.select('.eachStory')
-            for item in news_elements[:5]:
-                title_element = item.select_one('h3')
-                link_element = item.select_one('a')
-
-                if title_element and link_element:
-                    title = title_element.text.strip()
-                    link = link_element.get('href', '')
-                    if link and not link.startswith('http'):
-                        link = f"https://economictimes.indiatimes.com{link}"
-
-                    news_items.append({
-                        "title": title,
-                        "url": link
-                    })
-
-            if news_items:
-                return news_items
-
-        # Fallback to static news
-        return [
-            {"title": "Nifty scales new highs as IT stocks rally",
-             "url": "https://economictimes.indiatimes.com/markets/stocks/news"},
-            {"title": "Reliance Industries reports Q4 results",
-             "url": "https://economictimes.indiatimes.com/markets/stocks/news"},
-            {"title": "Banking stocks lead market gains",
-             "url": "https://economictimes.indiatimes.com/markets/stocks/news"},
-            {"title": "Global cues drive Indian markets",
-             "url": "https://economictimes.indiatimes.com/markets/stocks/news"},
-            {"title": "FII investment trends in Indian equities",
-             "url": "https://economictimes.indiatimes.com/markets/stocks/news"}
-        ]
-    except Exception as e:
-        # Return backup news
-        return [
-            {"title": "Market Updates: Daily Trading Summary", "url": "https://economictimes.indiatimes.com/markets"},
-            {"title": "Top Gainers and Losers of the Day",
-             "url": "https://economictimes.indiatimes.com/markets/stocks"},
-            {"title": "Quarterly Results Analysis", "url": "https://economictimes.indiatimes.com/markets/earnings"},
-            {"title": "Sectoral Performance Overview", "url": "https://economictimes.indiatimes.com/markets/stocks"},
-            {"title": "Investment Ideas for Current Market",
-             "url": "https://economictimes.indiatimes.com/markets/stocks"}
-        ]
+    response = requests.get(url, headers=headers, timeout=SOURCE_BUDGETS["economictimes"])
+    response.raise_for_status()
+
+    soup = BeautifulSoup(response.text, 'html.parser')
+    news_items = []
+
+    news_elements = soup.select('.eachStory')
+    for item in news_elements[:5]:
+        title_element = item.select_one('h3')
+        link_element = item.select_one('a')
+
+        if title_element and link_element:
+            title = title_element.text.strip()
+            link = link_element.get('href', '')
+            if link and not link.startswith('http'):
+                link = f"https://economictimes.indiatimes.com{link}"
+
+            news_items.append({
+                "title": title,
+                "url": link
+            })
+
+    return news_items
 
 
 def get_basic_analysis(stock_data):
@@ -353,6 +334,21 @@ def track_api_usage(session_state, increment=1):
     return None
 
 
+@st.fragment(run_every=LIVE_INTERVAL)
+def live_quote_panel(ticker, company_name, last_price):
+    """Live price and intraday chart, refreshed without rerunning the page"""
+    started = time.thread_time()
+    feed = get_quote_feed()
+    symbol = nse_symbol(ticker)
+    if hasattr(feed, "seed_price") and isinstance(last_price, (int, float)):
+        feed.seed_price(symbol, last_price)
+
+    render_live_metric(symbol, feed, label="Live Price", prefix="₹")
+    render_live_chart(symbol, feed, key="app", title=f"{company_name} - Live")
+    record_cpu("live_cpu_ms", started)
+    cpu_caption()
+
+
 # --- Initialize session state ---
 if 'last_search' not in st.session_state:
     st.session_state['last_search'] = ""
@@ -360,6 +356,11 @@ if 'last_search' not in st.session_state:
 if 'api_calls' not in st.session_state:
     st.session_state['api_calls'] = 0
 
+if 'llm_calls_avoided' not in st.session_state:
+    st.session_state['llm_calls_avoided'] = 0
+if 'llm_calls_made' not in st.session_state:
+    st.session_state['llm_calls_made'] = 0
+
 # --- UI Layout ---
 st.title("📈 Indian Stock Dashboard")
 st.caption(f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -385,6 +386,8 @@ with st.sidebar:
             else:
                 st.warning("No results found. Try another search.")
 
+    live_mode = st.toggle("Live quotes", help=f"Refresh price and chart every {LIVE_INTERVAL:g}s without rerunning the page")
+
     # Default ticker entry - Changed default from RELIANCE to NIFTY
     ticker = st.text_input("Enter Stock Symbol", "NIFTY").strip().upper()
 
@@ -417,7 +420,7 @@ with st.sidebar:
                 st.rerun()
 
 # Main Dashboard
-tab1, tab2, tab3 = st.tabs(["📊 Market Data", "📰 Latest News", "🤖 AI Advisor"])
+tab1, tab2, tab3, tab4 = st.tabs(["📊 Market Data", "📰 Latest News", "🤖 AI Advisor", "📉 Portfolio Risk"])
 
 with tab1:
     with st.spinner("Fetching stock data..."):
@@ -429,6 +432,10 @@ with tab1:
     else:
         # Create header with company name and current price
         st.header(f"{data['company_name']} ({ticker})")
+        if stale_message(data, "Screener.in"):
+            st.warning(stale_message(data, "Screener.in"))
+        if live_mode:
+            live_quote_panel(ticker, data['company_name'], data['price_numeric'])
 
         # About section similar to screenshot
         st.subheader("ABOUT")
@@ -572,6 +579,8 @@ with tab2:
     if not news_items:
         st.warning("Could not retrieve news at this time. Please try again later.")
     else:
+        if stale_message(news_items, "Economic Times"):
+            st.caption(stale_message(news_items, "Economic Times"))
         for item in news_items:
             with st.expander(item["title"]):
                 st.markdown(f"[Read Full Article]({item['url']})")
@@ -589,18 +598,15 @@ with tab3:
         else:
             st.warning("Please enter your OpenAI API key to use the AI Advisor feature")
 
-    # Initialize chat state
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-
-    # Display chat history
-    for msg in st.session_state.messages:
-        with st.chat_message(msg["role"]):
-            st.write(msg["content"])
+    # Persistent chat history, only the latest messages are rendered
+    history = get_history_store()
+    session_id, user_id = get_chat_identity()
+    render_history(history, session_id, user_id)
 
     # Chat input
     if prompt := st.chat_input(f"Ask about {ticker}..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        history.append(session_id, user_id, "user", prompt)
+        used_llm = False
 
         with st.chat_message("user"):
             st.write(prompt)
@@ -616,53 +622,155 @@ with tab3:
                         # Create a more concise stock info to reduce token usage
                         stock_info = f"Company: {stock_data['company_name']}, Ticker: {ticker}, Price: {stock_data['price']}, Change: {stock_data['change_pct']}, P/E: {stock_data['pe_ratio']}, Div Yield: {stock_data['dividend_yield']}"
 
-                    if api_key:
+                    # Simple metric lookups are answered locally without an LLM round trip
+                    known_tickers = [s["ticker"] for s in get_popular_stocks() + get_major_indices()]
+                    route = route_question(prompt, ticker, stock_data, get_basic_analysis,
+                                           fetch=get_screener_data, known_tickers=known_tickers)
+
+                    if route["route"] == "local":
+                        result = route["answer"]
+                        st.session_state['llm_calls_avoided'] += 1
+                    elif api_key:
+                        # Running summary + last few turns keeps the prompt size flat
+                        used_llm = True
+                        st.session_state['llm_calls_made'] += 1
+                        summary, recent = history.context(session_id, user_id)
+                        system_prompt = f"You're a financial advisor. Current stock data: {stock_info}. Be concise."
+                        if summary:
+                            system_prompt += f" Conversation so far: {summary}"
                         try:
-                            client = OpenAI(api_key=api_key)
-
-                            # Use a more efficient system prompt to save tokens
-                            response = client.chat.completions.create(
+                            # Shared client + rate-limit-aware queue, chat ahead of background work
+                            response = chat_completion(
+                                api_key,
+                                priority=PRIORITY_INTERACTIVE,
+                                timeout=INTERACTIVE_TIMEOUT,
                                 model="gpt-3.5-turbo",
-                                messages=[{
-                                    "role": "system",
-                                    "content": f"You're a financial advisor. Current stock data: {stock_info}. Be concise."
-                                }, {
-                                    "role": "user",
-                                    "content": prompt
-                                }],
+                                messages=[{"role": "system", "content": system_prompt}] + [
+                                    {"role": m["role"], "content": m["content"]} for m in recent
+                                ],
                                 temperature=0.3,
                                 max_tokens=150  # Limit response size for free tier
                             )
                             result = response.choices[0].message.content
+                        except openai.RateLimitError:
+                            result = f"Free tier API quota exceeded. Try again later or upgrade your OpenAI plan. Stock info: {stock_info}"
+                            st.error(
+                                "API quota exceeded. Consider spacing out your questions or upgrading your OpenAI plan.")
+                        except openai.AuthenticationError:
+                            result = "Invalid API key. Please check your OpenAI API key."
+                            st.error("Authentication error. Please verify your API key.")
+                        except FutureTimeout:
+                            result = f"The AI advisor is busy right now. Please try again shortly. Stock info: {stock_info}"
+                            st.warning(f"No answer within {INTERACTIVE_TIMEOUT:g}s (usually a rate-limit pause); the request was cancelled.")
                         except Exception as api_error:
-                            # Handle API errors more specifically
-                            if "429" in str(api_error):
-                                result = f"Free tier API quota exceeded. Try again later or upgrade your OpenAI plan. Stock info: {stock_info}"
-                                st.error(
-                                    "API quota exceeded. Consider spacing out your questions or upgrading your OpenAI plan.")
-                            elif "401" in str(api_error):
-                                result = "Invalid API key. Please check your OpenAI API key."
-                                st.error("Authentication error. Please verify your API key.")
-                            else:
-                                result = f"AI service unavailable. Here's the stock data: {stock_info}"
-                                st.error(f"API error: {str(api_error)}")
+                            result = f"AI service unavailable. Here's the stock data: {stock_info}"
+                            st.error(f"API error: {str(api_error)}")
                     else:
                         result = "AI Advisor requires an OpenAI API key. Please enter your API key in the text field above."
 
                     st.write(result)
-                    st.session_state.messages.append({"role": "assistant", "content": result})
+                    st.caption(f"Route: {route['route']} ({', '.join(route['intents']) or 'open-ended'}) · "
+                               f"routing {route['latency_ms']:.1f} ms · "
+                               f"LLM calls this session: {st.session_state['llm_calls_made']} made, "
+                               f"{st.session_state['llm_calls_avoided']} avoided")
+                    history.append(session_id, user_id, "assistant", result)
 
                 except Exception as e:
                     fallback_response = f"Sorry, I couldn't process your question. Here's what I know about {ticker}: {stock_data['company_name']} at price {stock_data.get('price', 'N/A')}."
                     st.error(f"Error: {str(e)}")
                     st.write(fallback_response)
-                    st.session_state.messages.append({"role": "assistant", "content": fallback_response})
+                    history.append(session_id, user_id, "assistant", fallback_response)
                     st.info("This could be due to an invalid API key, connection issue, or quota limits.")
 
+        # The model summarizes once per full batch and only on turns that already
+        # went to it; locally answered turns fold in extractively, without an API call
+        if api_key and used_llm and history.needs_summary(session_id, user_id):
+            st.session_state['llm_calls_made'] += 1
+            history.refresh_summary_async(session_id, user_id, llm_summarizer(api_key))
+        else:
+            history.refresh_summary_async(session_id, user_id, extractive_summary)
+
+@st.fragment
+def portfolio_risk_panel():
+    """Risk tab body; widgets here rerun only this fragment and data loads on demand"""
+    watchlist_text = st.text_input("Watchlist (comma-separated symbols)", key="watchlist")
+    watchlist = [t.strip().upper() for t in watchlist_text.split(",") if t.strip()]
+
+    col1, col2 = st.columns(2)
+    with col1:
+        risk_period = st.selectbox("History", ["1y", "3y", "5y", "10y"], index=3)
+    with col2:
+        confidence = st.select_slider("VaR confidence", options=[0.90, 0.95, 0.99], value=0.95)
+
+    tickers = []
+    for t in [s["ticker"] for s in get_popular_stocks() + get_major_indices()] + watchlist:
+        if t not in tickers:
+            tickers.append(t)
+    params = (tuple(tickers), risk_period, confidence)
+
+    # Results are kept in session state so chat messages and other reruns don't recompute them
+    if st.button("Compute risk", type="primary"):
+        symbols = [nse_symbol(t) for t in tickers]
+        names = dict(zip(symbols, tickers))
+        benchmark = nse_symbol("NIFTY")
+
+        with st.spinner("Loading price histories..."):
+            closes = align_closes(load_closes(symbols, risk_period))
+
+        if closes.shape[1] < 2:
+            st.session_state['portfolio_risk'] = {"params": params, "risk": None}
+        else:
+            closes = closes.rename(columns=names)
+            risk = compute_risk(closes, benchmark=names[benchmark], confidence=confidence)
+            corr = risk["correlation"]
+            fig = go.Figure(go.Heatmap(z=corr.values, x=corr.columns, y=corr.index, zmin=-1, zmax=1,
+                                       colorscale="RdBu"))
+            fig.update_layout(template="plotly_white", height=max(400, 22 * len(corr)),
+                              margin=dict(l=0, r=0, t=20, b=0))
+            st.session_state['portfolio_risk'] = {
+                "params": params,
+                "risk": {"stats": risk["stats"], "portfolio": risk["portfolio"]},
+                "fig": fig,
+                "missing": [t for t in tickers if t not in closes.columns],
+            }
+
+    result = st.session_state.get('portfolio_risk')
+    if result is None:
+        st.info("Press **Compute risk** to load price histories and compute the statistics.")
+        return
+    if result["params"] != params:
+        st.caption("Settings changed since the last run; press **Compute risk** to refresh.")
+    if result["risk"] is None:
+        st.warning("Not enough price history available to compute portfolio risk.")
+        return
+
+    if result["missing"]:
+        st.info(f"No price history for: {', '.join(result['missing'])}")
+
+    risk = result["risk"]
+    metric_cols = st.columns(len(risk["portfolio"]))
+    for col, (label, value) in zip(metric_cols, risk["portfolio"].items()):
+        col.metric(f"Portfolio {label}", f"{value:.2%}")
+
+    st.subheader("Per-symbol Risk")
+    formats = {c: "{:.2f}" if c == "Beta" else "{:.2%}" for c in risk["stats"].columns}
+    st.dataframe(risk["stats"].style.format(formats), use_container_width=True)
+
+    st.subheader("Correlation Matrix")
+    st.plotly_chart(result["fig"], use_container_width=True)
+
+
+with tab4:
+    st.header("Portfolio Risk")
+    st.caption("Risk statistics across popular stocks, indices and your watchlist, equal-weighted")
+    portfolio_risk_panel()
+
 # --- Footer ---
 st.divider()
 col1, col2 = st.columns(2)
 with col1:
     st.caption("*Data provided by Screener.in. AI responses may not be 100% accurate.*")
 with col2:
-    st.caption("Last updated: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
\ No newline at end of file
+    st.caption("Last updated: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+record_cpu("full_run_cpu_ms", run_started)
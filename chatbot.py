@@ -4,9 +4,10 @@ from PyPDF2 import PdfReader
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain.chains import RetrievalQA
+from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.prompts import PromptTemplate
 import streamlit as st
+from typing import Dict, List, Optional
 
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
@@ -17,6 +18,7 @@ class IntelligentInvestorChatbot:
         self.pdf_path = pdf_path
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.vector_store = None
+        self.retriever = None
         self.qa_chain = None
         self._initialize()
 
@@ -54,15 +56,13 @@ class IntelligentInvestorChatbot:
 
             prompt_template = """Answer as Benjamin Graham using this context:
             {context}
+            Conversation so far: {history}
             Question: {question}
             Answer:"""
 
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=llm,
-                chain_type="stuff",
-                retriever=self.vector_store.as_retriever(search_kwargs={"k": 3}),
-                chain_type_kwargs={"prompt": PromptTemplate.from_template(prompt_template)}
-            )
+            # Retrieval runs on the question alone; the history only goes into the prompt
+            self.retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
+            self.qa_chain = create_stuff_documents_chain(llm, PromptTemplate.from_template(prompt_template))
 
         except Exception as e:
             logger.error(f"Initialization error: {str(e)}")
@@ -76,13 +76,26 @@ class IntelligentInvestorChatbot:
                 text.append(page.extract_text())
         return "\n".join(text)
 
-    def respond(self, question: str) -> str:
+    @staticmethod
+    def _format_history(summary: str, recent: Optional[List[Dict[str, str]]]) -> str:
+        # Bounded summary of earlier turns plus the latest messages verbatim
+        lines = [summary[-1000:]] if summary else []
+        lines += [f"{m['role']}: {m['content'][:300]}" for m in recent or []]
+        return "\n".join(lines) or "(none)"
+
+    def respond(self, question: str, history_summary: str = "",
+                recent: Optional[List[Dict[str, str]]] = None) -> str:
         if not self.qa_chain:
             return "Financial advisor not ready yet..."
 
+        query = question[:500]
         try:
-            result = self.qa_chain.invoke({"query": question[:500]})
-            return result["result"]
+            docs = self.retriever.invoke(query)
+            return self.qa_chain.invoke({
+                "context": docs,
+                "question": query,
+                "history": self._format_history(history_summary, recent),
+            })
         except Exception as e:
             logger.error(f"Response error: {str(e)}")
             return "I'm having trouble answering that. Please try rephrasing."
\ No newline at end of file
@@ -2,8 +2,13 @@ import streamlit as st
 from chatbot import IntelligentInvestorChatbot
 from utils.data import get_stock_data, get_realtime_price
 from utils.news import get_finance_news
+from utils.fetch import stale_message
+from utils.history import get_history_store, get_chat_identity, render_history
+from utils.ticker import get_quote_feed, render_live_metric, render_live_chart, record_cpu, cpu_caption, LIVE_INTERVAL
 import time
 
+run_started = time.thread_time()
+
 # Configure page
 st.set_page_config(page_title="Finance Assistant", layout="wide")
 
@@ -15,54 +20,83 @@ if 'chatbot' not in st.session_state:
 st.sidebar.title("Controls")
 symbol = st.sidebar.text_input("Stock Symbol", "AAPL")
 timeframe = st.sidebar.selectbox("Timeframe", ["1d", "1wk", "1mo"])
+live_mode = st.sidebar.toggle("Live quotes", help=f"Refresh price and chart every {LIVE_INTERVAL:g}s without rerunning the page")
 
 # Main dashboard
 st.title("📈 Smart Finance Assistant")
 
+@st.fragment(run_every=LIVE_INTERVAL)
+def live_price(symbol):
+    started = time.thread_time()
+    render_live_metric(symbol, get_quote_feed())
+    record_cpu("live_cpu_ms", started)
+    cpu_caption()
+
+
+@st.fragment(run_every=LIVE_INTERVAL)
+def live_chart(symbol, history):
+    started = time.thread_time()
+    render_live_chart(symbol, get_quote_feed(), key="main", history=history)
+    record_cpu("live_cpu_ms", started)
+
+
 # Real-time Data Section
 col1, col2, col3 = st.columns([2, 2, 3])
 with col1:
     st.subheader("Live Prices")
-    if symbol:
+    if symbol and live_mode:
+        live_price(symbol)
+    elif symbol:
         price_data = get_realtime_price(symbol)
         if price_data["status"] == "success":
             st.metric("Current Price", f"${price_data['price']:.2f}",
                       f"{price_data['change_percent']:.2f}%")
+            if stale_message(price_data, "Yahoo Finance"):
+                st.caption(stale_message(price_data, "Yahoo Finance"))
 
 with col2:
     st.subheader("Market News")
     news_items = get_finance_news(symbol)
     for item in news_items[:3]:
         st.markdown(f"» [{item['title']}]({item['link']})")
+    if stale_message(news_items, "Yahoo Finance news"):
+        st.caption(stale_message(news_items, "Yahoo Finance news"))
 
 # Historical Data Chart
 with col3:
     st.subheader("Historical Trend")
     data = get_stock_data(symbol, timeframe)
-    if not data.empty:
+    if live_mode:
+        live_chart(symbol, data)
+    elif not data.empty:
         st.line_chart(data.set_index('Date')['Close'])
+        if stale_message(data, "Yahoo Finance"):
+            st.caption(stale_message(data, "Yahoo Finance"))
 
 # Chatbot Interface
 st.divider()
 st.subheader("💬 Intelligent Investment Advisor")
 
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+history = get_history_store()
+session_id, user_id = get_chat_identity()
 
-# Display chat messages
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# Display the latest chat messages, older ones on demand
+render_history(history, session_id, user_id)
 
 # Chat input
 if prompt := st.chat_input("Ask about investing or stock analysis"):
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    # Summary plus the last few turns, read before this question is stored
+    summary, recent = history.context(session_id, user_id)
+    history.append(session_id, user_id, "user", prompt)
 
     with st.chat_message("user"):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        response = st.session_state.chatbot.respond(prompt)
+        response = st.session_state.chatbot.respond(prompt, summary, recent)
         st.markdown(response)
 
-    st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+    history.append(session_id, user_id, "assistant", response)
+    history.refresh_summary_async(session_id, user_id)
+
+record_cpu("full_run_cpu_ms", run_started)
\ No newline at end of file
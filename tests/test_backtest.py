@@ -0,0 +1,79 @@
+"""Vectorized backtester against a naive share-by-share simulation"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.backtest import backtest, performance_stats, rebalance_mask, run_grid, select, prepare_universe
+
+
+@pytest.fixture
+def universe():
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range("2018-01-01", periods=750)
+    tickers = [f"S{i}" for i in range(12)]
+    prices = 100 * np.cumprod(1 + rng.normal(0.0003, 0.02, (len(dates), len(tickers))), axis=0)
+    prices[:200, 3] = np.nan  # listed later
+    pe = rng.uniform(-5, 30, (len(dates), len(tickers)))
+    pb = rng.uniform(0.3, 3, (len(dates), len(tickers)))
+    # Fundamentals change once a quarter, like reported numbers
+    quarter = rebalance_mask(dates, "Q")
+    for values in (pe, pb):
+        values[~quarter] = np.nan
+    frame = lambda values: pd.DataFrame(values, index=dates, columns=tickers)
+    return {"prices": frame(prices), "pe": frame(pe).ffill(), "pb": frame(pb).ffill()}
+
+
+def naive_equity(universe, rules):
+    """Buy equal value of each passing name at every rebalance and hold the shares"""
+    prices = universe["prices"].to_numpy()
+    passed = select(prepare_universe(universe), rules)
+    rebalance = rebalance_mask(universe["prices"].index, rules["rebalance"])
+    value, shares, cash, equity = 1.0, np.zeros(prices.shape[1]), 1.0, []
+    for t in range(len(prices)):
+        if t > 0:
+            value = cash + np.nansum(shares * prices[t])
+        equity.append(value)
+        if rebalance[t]:
+            names = np.flatnonzero(passed[t])
+            shares, cash = np.zeros(prices.shape[1]), value if len(names) == 0 else 0.0
+            shares[names] = value / len(names) / prices[t, names] if len(names) else 0.0
+    return np.array(equity)
+
+
+@pytest.mark.parametrize("rebalance", ["M", "Q", "A"])
+def test_matches_naive_simulation(universe, rebalance):
+    rules = {"max_pe": 15, "max_pb": 1.5, "rebalance": rebalance, "cost_bps": 0}
+    result = backtest(universe, rules)
+    np.testing.assert_allclose(result["equity"].to_numpy(), naive_equity(universe, rules), rtol=1e-12)
+
+
+def test_costs_charged_on_rebalance_turnover(universe):
+    rules = {"max_pe": 15, "rebalance": "Q"}
+    free = backtest(universe, {**rules, "cost_bps": 0})["returns"]
+    charged = backtest(universe, {**rules, "cost_bps": 25})["returns"]
+    drag = (free - charged).to_numpy()
+
+    rb_idx = np.flatnonzero(rebalance_mask(universe["prices"].index, "Q"))
+    assert np.allclose(np.delete(drag, rb_idx + 1), 0)
+    # First rebalance buys the whole book from cash: half the summed weight change
+    assert drag[rb_idx[0] + 1] == pytest.approx(0.5 * 25 / 10000)
+
+
+def test_rules_exclude_missing_and_negative_values(universe):
+    passed = select(prepare_universe(universe), {"max_pe": 15, "max_pb": None})
+    pe = universe["pe"].to_numpy()
+    assert not passed[:200, 3].any()
+    assert not passed[pe <= 0].any()
+
+
+def test_sharpe_is_mean_over_volatility():
+    returns = np.array([0.01, -0.005, 0.002, 0.004, -0.001])
+    stats = performance_stats(returns, np.array([1.0]))
+    expected = returns.mean() * 252 / (returns.std(ddof=1) * np.sqrt(252))
+    assert stats["sharpe"] == pytest.approx(expected)
+
+
+def test_grid_sorted_by_sharpe(universe):
+    results = run_grid(universe, {"max_pe": [10, 15, 20], "rebalance": ["M", "Q"]}, processes=1)
+    assert len(results) == 6
+    assert results["sharpe"].is_monotonic_decreasing
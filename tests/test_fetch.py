@@ -0,0 +1,191 @@
+"""Resilience layer against a local HTTP stub that injects delays, errors and bad payloads"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils import cache, fetch
+from utils.fetch import CircuitBreaker, get_breaker, resilient_cache, stale_message
+
+BUDGET = 0.3
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        key = self.path.strip("/")
+        self.server.hits.append(key)
+        mode = self.server.modes.get(key, self.server.mode)
+        if mode == "slow":
+            time.sleep(1.0)
+        if mode == "hang":
+            time.sleep(2.0)
+        if mode == "error":
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = {"error": f"{key} not found"} if mode == "missing" else {"ticker": key, "price": 100, "error": None}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up on a slow response
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.mode, server.modes, server.hits = "ok", {}, []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", cache.MemoryBackend())
+    monkeypatch.setattr(fetch, "_breakers", {})
+    monkeypatch.setattr(fetch, "_bulkheads", {})
+    monkeypatch.setitem(fetch.SOURCE_BUDGETS, "stub", BUDGET)
+
+
+def make_quote(stub, ttl=60.0, socket_timeout=BUDGET):
+    @resilient_cache("stub", ttl=ttl, cache_if=lambda r: not r.get("error"),
+                     fallback=lambda ticker: {"error": "stub unavailable"})
+    def get_quote(ticker):
+        response = requests.get(f"{stub.url}/{ticker}", timeout=socket_timeout)
+        response.raise_for_status()
+        return response.json()
+
+    return get_quote
+
+
+def test_fresh_value_is_cached(stub):
+    get_quote = make_quote(stub)
+    assert get_quote("TCS")["price"] == 100
+    assert get_quote("TCS")["price"] == 100
+    assert stub.hits == ["TCS"]
+
+
+def test_delay_is_cut_off_at_budget(stub):
+    stub.mode = "slow"
+    get_quote = make_quote(stub)
+    started = time.monotonic()
+    assert get_quote("TCS") == {"error": "stub unavailable"}
+    assert time.monotonic() - started < BUDGET + 0.3
+    assert get_breaker("stub").failures == 1
+
+
+def test_errors_open_breaker_and_trial_recovers(stub):
+    stub.mode = "error"
+    fetch._breakers["stub"] = CircuitBreaker(reset_timeout=0.2)
+    get_quote = make_quote(stub)
+    for ticker in ["A", "B", "C"]:
+        assert get_quote(ticker)["error"] == "stub unavailable"
+    assert get_breaker("stub").state == "open"
+
+    # Open circuit: nothing reaches the upstream
+    assert get_quote("D")["error"] == "stub unavailable"
+    assert stub.hits == ["A", "B", "C"]
+
+    stub.mode = "ok"
+    time.sleep(0.25)
+    assert get_quote("E")["price"] == 100
+    assert get_breaker("stub").state == "closed"
+
+
+def test_bad_payload_falls_back_per_key_without_tripping_breaker(stub):
+    stub.mode = "missing"
+    get_quote = make_quote(stub)
+    for ticker in ["TYPO1", "TYPO2", "TYPO3", "TYPO4"]:
+        assert get_quote(ticker) == {"error": f"{ticker} not found"}
+    breaker = get_breaker("stub")
+    assert (breaker.state, breaker.failures) == ("closed", 0)
+
+    # Not cached, and a valid ticker still goes through
+    get_quote("TYPO1")
+    assert stub.hits.count("TYPO1") == 2
+    stub.modes["TCS"] = "ok"
+    assert get_quote("TCS")["price"] == 100
+
+
+def test_bad_payload_closes_half_open_breaker(stub):
+    breaker = fetch._breakers["stub"] = CircuitBreaker(reset_timeout=0.1)
+    for _ in range(3):
+        breaker.record_failure()
+    stub.mode = "missing"
+    time.sleep(0.15)
+    make_quote(stub)("TYPO")
+    assert breaker.state == "closed"
+
+
+def test_stale_snapshot_served_when_upstream_fails(stub):
+    get_quote = make_quote(stub, ttl=0.1)
+    assert get_quote("TCS")["price"] == 100
+    time.sleep(0.15)
+
+    stub.mode = "error"
+    value = get_quote("TCS")
+    assert value["price"] == 100 and value["stale"]
+    assert stale_message(value, "Stub").startswith("Stub is slow or unavailable")
+
+
+def test_bulkhead_refuses_calls_beyond_its_size(stub):
+    stub.mode = "hang"
+    fetch._breakers["stub"] = CircuitBreaker(failure_threshold=100)
+    # Like feedparser before, an upstream call that outlives the budget
+    get_quote = make_quote(stub, socket_timeout=5.0)
+    for i in range(fetch.BULKHEAD_SIZE):
+        get_quote(f"HUNG{i}")
+
+    # Every slot is still blocked on the slow upstream: refused at once, not queued
+    started = time.monotonic()
+    assert get_quote("NEXT") == {"error": "stub unavailable"}
+    assert time.monotonic() - started < 0.1
+    assert "NEXT" not in stub.hits
+
+
+def timed_concurrent_calls(get_quote, ticker, callers=5):
+    def timed(_):
+        started = time.monotonic()
+        value = get_quote(ticker)
+        return value, time.monotonic() - started
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        return list(pool.map(timed, range(callers)))
+
+
+def test_concurrent_callers_get_snapshot_while_one_refreshes(stub):
+    get_quote = make_quote(stub, ttl=0.1)
+    get_quote("TCS")
+    time.sleep(0.15)
+
+    stub.mode = "slow"
+    results = timed_concurrent_calls(get_quote, "TCS")
+    assert all(value["price"] == 100 and value["stale"] for value, _ in results)
+    # Only the lock holder waits out the budget; the upstream is hit once
+    assert max(latency for _, latency in results) < BUDGET + 0.2
+    assert sorted(latency for _, latency in results)[-2] < 0.1
+    assert stub.hits.count("TCS") == 2
+
+
+def test_concurrent_callers_without_snapshot_wait_at_most_budget(stub):
+    stub.mode = "slow"
+    get_quote = make_quote(stub)
+    results = timed_concurrent_calls(get_quote, "TCS")
+    assert all(value == {"error": "stub unavailable"} for value, _ in results)
+    assert max(latency for _, latency in results) < BUDGET + 0.3
+    assert stub.hits.count("TCS") == 1
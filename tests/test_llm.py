@@ -0,0 +1,109 @@
+"""Request queue against a local fake OpenAI-compatible server"""
+import json
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import llm
+from utils.llm import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMRequestQueue, chat_completion
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.requests.append((time.monotonic(), body["messages"][-1]["content"]))
+            throttle = server.throttle > 0
+            server.throttle -= throttle
+
+        if throttle:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                       "code": "rate_limit_exceeded"}},
+                       {"retry-after": str(server.retry_after)})
+            return
+        self._send(200, {
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": body["messages"][-1]["content"]}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }, server.headers)
+
+    def _send(self, status, payload, headers):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests, server.throttle, server.retry_after, server.headers = [], 0, 0.2, {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(llm, "BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setattr(llm, "_clients", {})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def ask(queue, content, priority=PRIORITY_INTERACTIVE):
+    return queue.submit("sk-test", priority=priority, model="gpt-3.5-turbo",
+                        messages=[{"role": "user", "content": content}])
+
+
+def test_completion_through_queue(fake_openai):
+    reply = ask(LLMRequestQueue(max_concurrency=1), "hello").result(timeout=5)
+    assert reply.choices[0].message.content == "hello"
+
+
+def test_interactive_served_before_background(fake_openai):
+    queue = LLMRequestQueue(max_concurrency=1)
+    queue._pause(0.2)
+    futures = [ask(queue, f"bg{i}", PRIORITY_BACKGROUND) for i in range(3)]
+    futures.append(ask(queue, "chat", PRIORITY_INTERACTIVE))
+    for future in futures:
+        future.result(timeout=5)
+    assert [content for _, content in fake_openai.requests] == ["chat", "bg0", "bg1", "bg2"]
+
+
+def test_429_retried_after_retry_after(fake_openai):
+    fake_openai.throttle, fake_openai.retry_after = 2, 0.2
+    started = time.monotonic()
+    reply = ask(LLMRequestQueue(max_concurrency=1), "retry me").result(timeout=10)
+    assert reply.choices[0].message.content == "retry me"
+    assert len(fake_openai.requests) == 3
+    assert time.monotonic() - started >= 0.4
+
+
+def test_exhausted_quota_header_pauses_dispatch(fake_openai):
+    fake_openai.headers = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "300ms"}
+    queue = LLMRequestQueue(max_concurrency=1)
+    ask(queue, "first").result(timeout=5)
+    ask(queue, "second").result(timeout=5)
+    (first, _), (second, _) = fake_openai.requests
+    assert second - first >= 0.25
+
+
+def test_timed_out_request_is_cancelled(fake_openai, monkeypatch):
+    queue = LLMRequestQueue(max_concurrency=1)
+    monkeypatch.setattr(llm, "_queue", queue)
+    queue._pause(0.5)
+    with pytest.raises(FutureTimeout):
+        chat_completion("sk-test", timeout=0.1, model="gpt-3.5-turbo",
+                        messages=[{"role": "user", "content": "too late"}])
+    time.sleep(0.7)
+    assert fake_openai.requests == []
@@ -0,0 +1,84 @@
+"""Local-vs-LLM routing of chat questions"""
+import pytest
+
+from utils.router import classify, route_question
+
+KNOWN = ["RELIANCE", "NIFTY", "HDFCBANK", "TCS", "ICICIBANK", "LT", "INFY", "BHARTIARTL", "ITC", "SBIN", "SENSEX"]
+TCS = {"ticker": "TCS", "company_name": "Tata Consultancy Services Ltd", "price": "3,500", "change_pct": "1.2%",
+       "market_cap": "12,00,000 Cr", "pe_ratio": "30", "price_to_book": "14", "dividend_yield": "1.3%",
+       "high": "4,500", "low": "3,300", "cagr_1yr": "5%", "cagr_5yr": "12%", "cagr_10yr": "15%",
+       "sector": "IT", "error": None}
+
+
+def route(question, stock_data=TCS):
+    fetched = []
+
+    def fetch(ticker):
+        fetched.append(ticker)
+        return {**TCS, "ticker": ticker, "company_name": ticker, "pe_ratio": "25"}
+
+    decision = route_question(question, "TCS", stock_data, lambda data: "analysis", fetch=fetch,
+                              known_tickers=KNOWN)
+    decision["fetched"] = fetched
+    return decision
+
+
+@pytest.mark.parametrize("question, intents", [
+    ("What is the price of TCS?", ["price"]),
+    ("What's TCS trading at right now?", ["price"]),
+    ("how much is TCS trading at", ["price"]),
+    ("TCS p/e", ["pe_ratio"]),
+    ("What is the price/earnings ratio?", ["pe_ratio"]),
+    ("price-to-book of tcs", ["price_to_book"]),
+    ("dividend yield of tcs", ["dividend_yield"]),
+    ("what is the low price", ["high_low"]),
+    ("52 week high and low", ["high_low"]),
+    ("what is the 5 year cagr", ["cagr"]),
+    ("What sector is Tata Consultancy in?", ["sector"]),
+    ("Is TCS undervalued?", ["analysis"]),
+])
+def test_lookups_answered_locally(question, intents):
+    decision = route(question)
+    assert decision["route"] == "local"
+    assert decision["intents"] == intents
+    assert decision["answer"]
+
+
+@pytest.mark.parametrize("question", [
+    # Conceptual and comparison questions
+    "What does P/E mean?",
+    "What is a good P/E ratio?",
+    "what is the p/e of tcs compared to infy",
+    "is tcs cheaper than infy",
+    "difference between pe and pb",
+    "what is the yield curve doing",
+    # Two tickers
+    "what is the p/e of tcs and infy",
+    # A company we don't know the ticker of
+    "what is the pe of wipro",
+    "what is the price of HCLTECH",
+    # Ranges and sectors the snapshot can't answer
+    "how has the price changed over 5 years",
+    "what was the price last month",
+    "what is the p/e ratio for the IT sector",
+    "Should I buy TCS?",
+])
+def test_open_questions_go_to_llm(question):
+    decision = route(question)
+    assert decision["route"] == "llm"
+    assert decision["answer"] is None
+
+
+def test_other_known_ticker_is_fetched():
+    decision = route("what is the pe of infy")
+    assert decision["route"] == "local"
+    assert decision["fetched"] == ["INFY"]
+    assert decision["answer"] == "The P/E ratio of INFY (INFY) is 25."
+
+
+def test_missing_data_falls_back_to_llm():
+    assert route("What is the price of TCS?", {"error": "Screener.in is not responding"})["route"] == "llm"
+
+
+def test_long_questions_go_to_llm():
+    assert classify("what is the price " + "of the stock " * 10)["route"] == "llm"
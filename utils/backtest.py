@@ -0,0 +1,233 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+FUNDAMENTALS = ["pe", "pb", "dividend_yield", "cagr"]
+
+# Graham-style defaults matching get_basic_analysis (P/E below 15 = potentially undervalued)
+DEFAULT_RULES = {
+    "max_pe": 15,
+    "max_pb": 1.5,
+    "min_dividend_yield": None,
+    "min_cagr": None,
+    "rebalance": "Q",
+    "cost_bps": 10,
+}
+
+# Rule key -> (fundamental, comparison)
+RULE_FIELDS = {
+    "max_pe": ("pe", "max"),
+    "max_pb": ("pb", "max"),
+    "min_dividend_yield": ("dividend_yield", "min"),
+    "min_cagr": ("cagr", "min"),
+}
+
+
+def load_universe(directory: str) -> Dict[str, pd.DataFrame]:
+    """Read stored wide CSVs (dates x tickers): prices.csv plus any of pe/pb/dividend_yield/cagr.csv.
+
+    Fundamentals are usually quarterly, so they are forward-filled onto the
+    price calendar; a value is only known from its report date onwards.
+    """
+    prices = pd.read_csv(os.path.join(directory, "prices.csv"), index_col=0, parse_dates=True).sort_index()
+    universe = {"prices": prices.ffill()}
+    for name in FUNDAMENTALS:
+        path = os.path.join(directory, f"{name}.csv")
+        if os.path.exists(path):
+            frame = pd.read_csv(path, index_col=0, parse_dates=True).sort_index()
+            universe[name] = frame.reindex(columns=prices.columns).reindex(prices.index, method="ffill")
+    return universe
+
+
+REBALANCE_PERIODS = {
+    "M": lambda d: d.year * 12 + d.month,
+    "Q": lambda d: d.year * 4 + (d.month - 1) // 3,
+    "A": lambda d: d.year,
+    "Y": lambda d: d.year,
+}
+
+
+def rebalance_mask(dates: pd.DatetimeIndex, freq: str) -> np.ndarray:
+    """True on the first trading day of each period ('M', 'Q', 'A'/'Y')"""
+    periods = np.asarray(REBALANCE_PERIODS[freq.upper()](dates))
+    mask = np.empty(len(dates), dtype=bool)
+    mask[0] = True
+    mask[1:] = periods[1:] != periods[:-1]
+    return mask
+
+
+def prepare_universe(universe: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    """Convert the universe to arrays once so parameter sweeps don't redo it per run"""
+    prices = universe["prices"]
+    prepared = {
+        "prepared": True,
+        "dates": prices.index,
+        "prices": prices.to_numpy(dtype=float),
+        "growth": {},
+    }
+    for name in FUNDAMENTALS:
+        if name in universe:
+            prepared[name] = universe[name].to_numpy(dtype=float)
+    return prepared
+
+
+def _growth(data: Dict[str, Any], freq: str):
+    """Price relative to the last rebalance, shared by every rule set with this frequency"""
+    if freq not in data["growth"]:
+        prices = data["prices"]
+        rebalance = rebalance_mask(data["dates"], freq)
+        held = np.maximum.accumulate(np.where(rebalance, np.arange(len(prices)), 0))
+        h = held[:-1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            grown_now = np.nan_to_num(prices[1:] / prices[h])
+            grown_prev = np.nan_to_num(prices[:-1] / prices[h])
+        data["growth"][freq] = (np.flatnonzero(rebalance), grown_now, grown_prev)
+    return data["growth"][freq]
+
+
+def select(data: Dict[str, Any], rules: Dict[str, Any], rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Boolean dates x tickers matrix of names passing every active rule (optionally only `rows`)"""
+    def take(values):
+        return values if rows is None else values[rows]
+
+    passed = np.isfinite(take(data["prices"]))
+    for key, (field, kind) in RULE_FIELDS.items():
+        threshold = rules.get(key)
+        if threshold is None:
+            continue
+        if field not in data:
+            raise ValueError(f"Rule '{key}' needs '{field}' data in the universe")
+        values = take(data[field])
+        with np.errstate(invalid="ignore"):
+            # NaN compares False, so missing fundamentals never pass
+            if kind == "max":
+                # Negative P/E or P/B means losses / negative equity, not cheapness
+                passed &= (values > 0) & (values < threshold)
+            else:
+                passed &= values >= threshold
+    return passed
+
+
+def backtest(universe: Dict[str, Any], rules: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Equal-weight the names passing the rules at each rebalance and hold until the next one.
+
+    Rules are evaluated on the rebalance dates x tickers matrix at once and
+    each holding period is valued with a single matrix-vector product;
+    holdings drift with prices between rebalances. Accepts a raw or
+    prepared universe.
+    """
+    rules = {**DEFAULT_RULES, **(rules or {})}
+    data = universe if universe.get("prepared") else prepare_universe(universe)
+    dates = data["dates"]
+    rb_idx, grown_now, grown_prev = _growth(data, rules["rebalance"].upper())
+
+    passed = select(data, rules, rb_idx)
+    counts = passed.sum(axis=1)
+    target = np.where(passed, 1.0 / np.maximum(counts, 1)[:, None], 0.0)
+
+    # Return on day t+1 comes from the holdings set at the last rebalance <= t
+    value_now = np.empty(len(grown_now))
+    value_prev = np.empty(len(grown_now))
+    ends = np.append(rb_idx[1:], len(grown_now))
+    for k, (start, end) in enumerate(zip(rb_idx, ends)):
+        value_now[start:end] = grown_now[start:end] @ target[k]
+        value_prev[start:end] = grown_prev[start:end] @ target[k]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        daily = np.where(value_prev > 0, value_now / value_prev - 1, 0.0)
+
+    # Charge costs on the turnover between consecutive target portfolios
+    turnover = 0.5 * np.abs(np.diff(target, axis=0, prepend=0.0)).sum(axis=1)
+    cost = np.zeros(len(dates))
+    cost[rb_idx] = turnover * rules["cost_bps"] / 10000
+    daily = daily - cost[:-1]
+
+    returns = pd.Series(np.concatenate([[0.0], daily]), index=dates)
+    return {
+        "returns": returns,
+        "equity": (1 + returns).cumprod(),
+        "holdings": pd.Series(counts, index=dates[rb_idx]),
+        "stats": performance_stats(returns.to_numpy(), turnover),
+    }
+
+
+def performance_stats(returns: np.ndarray, turnover: np.ndarray) -> Dict[str, float]:
+    """Annualised statistics of daily returns; Sharpe assumes a zero risk-free rate"""
+    equity = np.cumprod(1 + returns)
+    years = max(len(returns) / TRADING_DAYS, 1e-9)
+    vol = float(returns.std(ddof=1) * np.sqrt(TRADING_DAYS)) if len(returns) > 1 else 0.0
+    cagr = float(equity[-1] ** (1 / years) - 1)
+    return {
+        "cagr": cagr,
+        "volatility": vol,
+        "sharpe": float(returns.mean() * TRADING_DAYS) / vol if vol else 0.0,
+        "max_drawdown": float(np.min(equity / np.maximum.accumulate(equity) - 1)),
+        "avg_turnover": float(turnover.mean()) if len(turnover) else 0.0,
+    }
+
+
+_worker_universe: Optional[Dict[str, Any]] = None
+
+
+def _init_worker(universe: Dict[str, pd.DataFrame]):
+    # Ship the universe once per worker rather than once per parameter set
+    global _worker_universe
+    _worker_universe = prepare_universe(universe)
+
+
+def _run_one(rules: Dict[str, Any]) -> Dict[str, Any]:
+    return {**rules, **backtest(_worker_universe, rules)["stats"]}
+
+
+def run_grid(universe: Dict[str, pd.DataFrame], grid: Dict[str, List[Any]],
+             processes: Optional[int] = None) -> pd.DataFrame:
+    """Backtest every combination in `grid` across worker processes, best Sharpe first"""
+    keys = list(grid)
+    combos = [{**DEFAULT_RULES, **dict(zip(keys, values))} for values in itertools.product(*grid.values())]
+
+    if processes == 1 or len(combos) == 1:
+        _init_worker(universe)
+        rows = [_run_one(rules) for rules in combos]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(universe,)) as pool:
+            chunksize = max(1, len(combos) // ((processes or os.cpu_count() or 1) * 4))
+            rows = list(pool.map(_run_one, combos, chunksize=chunksize))
+
+    return pd.DataFrame(rows).sort_values("sharpe", ascending=False).reset_index(drop=True)
+
+
+def _values(text: str, cast=float) -> List[Any]:
+    # "10,15,none" -> [10.0, 15.0, None]; "none" switches a rule off
+    return [None if v.strip().lower() == "none" else cast(v) for v in text.split(",")]
+
+
+if __name__ == "__main__":
+    # python -m utils.backtest data/ --max-pe 10,15,20 --max-pb 1,1.5,none --rebalance M,Q
+    parser = argparse.ArgumentParser(description="Sweep Graham-style value rules over a stored universe")
+    parser.add_argument("directory", help="folder with prices.csv and pe/pb/dividend_yield/cagr.csv")
+    parser.add_argument("--max-pe", default=str(DEFAULT_RULES["max_pe"]))
+    parser.add_argument("--max-pb", default=str(DEFAULT_RULES["max_pb"]))
+    parser.add_argument("--min-dividend-yield", default="none")
+    parser.add_argument("--min-cagr", default="none")
+    parser.add_argument("--rebalance", default=DEFAULT_RULES["rebalance"])
+    parser.add_argument("--cost-bps", default=str(DEFAULT_RULES["cost_bps"]))
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    grid = {
+        "max_pe": _values(args.max_pe),
+        "max_pb": _values(args.max_pb),
+        "min_dividend_yield": _values(args.min_dividend_yield),
+        "min_cagr": _values(args.min_cagr),
+        "rebalance": _values(args.rebalance, str),
+        "cost_bps": _values(args.cost_bps),
+    }
+    results = run_grid(load_universe(args.directory), grid, args.processes)
+    print(results.head(args.top).to_string(index=False))
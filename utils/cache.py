@@ -0,0 +1,295 @@
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import closing
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("FINANCEBOT_CACHE_BACKEND", "sqlite")
+CACHE_PATH = os.getenv("FINANCEBOT_CACHE_PATH", "financebot_cache.db")
+CACHE_MAX_BYTES = int(float(os.getenv("FINANCEBOT_CACHE_MAX_MB", "256")) * 1024 * 1024)
+LOCK_LEASE = 30.0          # seconds a single-flight lock is held before others may take over
+POLL_INTERVAL = 0.05
+TOUCH_INTERVAL = 30.0      # seconds between LRU timestamp updates for a hot key
+
+MISS = object()
+
+
+def serialize(value: Any) -> bytes:
+    # Pickle round-trips DataFrames (including dtypes and index) and plain dicts
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def deserialize(blob: bytes) -> Any:
+    return pickle.loads(blob)
+
+
+class CacheBackend(ABC):
+    """Key/value store with TTLs and a single-flight lock per key.
+
+    Expired entries are kept until space is needed, so callers can still
+    read the last value with `allow_expired=True`.
+    """
+
+    @abstractmethod
+    def get(self, key: str, allow_expired: bool = False) -> Tuple[Any, float]:
+        """Return (value, stored_at) or (MISS, 0)"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float):
+        """Store value for ttl seconds, evicting entries to stay under the size limit"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove the entry if present"""
+
+    @abstractmethod
+    def acquire(self, key: str, owner: str, lease: float = LOCK_LEASE) -> bool:
+        """Take key's lock unless another owner holds an unexpired lease"""
+
+    @abstractmethod
+    def release(self, key: str, owner: str):
+        """Drop key's lock if owner still holds it"""
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process backend, for single-worker runs and development"""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, Tuple[str, float]] = {}
+        self._mutex = threading.Lock()
+
+    def get(self, key, allow_expired=False):
+        now = time.time()
+        with self._mutex:
+            entry = self._entries.get(key)
+            if entry is None or (entry["expires_at"] <= now and not allow_expired):
+                return MISS, 0
+            entry["accessed_at"] = now
+            return deserialize(entry["blob"]), entry["stored_at"]
+
+    def set(self, key, value, ttl):
+        blob = serialize(value)
+        now = time.time()
+        with self._mutex:
+            self._entries[key] = {"blob": blob, "size": len(blob), "stored_at": now,
+                                  "expires_at": now + ttl, "accessed_at": now}
+            total = sum(e["size"] for e in self._entries.values())
+            # Expired entries go first, then least recently used
+            for k in sorted(self._entries, key=lambda k: (self._entries[k]["expires_at"] > now,
+                                                          self._entries[k]["accessed_at"])):
+                if total <= self.max_bytes or k == key:
+                    break
+                total -= self._entries.pop(k)["size"]
+
+    def delete(self, key):
+        with self._mutex:
+            self._entries.pop(key, None)
+
+    def acquire(self, key, owner, lease=LOCK_LEASE):
+        now = time.time()
+        with self._mutex:
+            held = self._locks.get(key)
+            if held and held[1] > now and held[0] != owner:
+                return False
+            self._locks[key] = (owner, now + lease)
+            return True
+
+    def release(self, key, owner):
+        with self._mutex:
+            if self._locks.get(key, (None,))[0] == owner:
+                del self._locks[key]
+
+
+class SQLiteBackend(CacheBackend):
+    """Cache shared by every process on the host through one SQLite file in WAL mode"""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_evict ON cache (expires_at, accessed_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS locks (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )""")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, key, allow_expired=False):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT value, stored_at, expires_at, accessed_at FROM cache WHERE key = ?",
+                               (key,)).fetchone()
+            if row is None or (row[2] <= now and not allow_expired):
+                return MISS, 0
+            # Hits are read-only unless the LRU timestamp is stale, so readers
+            # in other workers don't queue on SQLite's write lock
+            if now - row[3] >= TOUCH_INTERVAL:
+                conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return deserialize(row[0]), row[1]
+
+    def set(self, key, value, ttl):
+        blob = serialize(value)
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, stored_at, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (key, blob, len(blob), now, now + ttl, now))
+            self._evict(conn, keep=key, now=now)
+
+    def _evict(self, conn: sqlite3.Connection, keep: str, now: float):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Expired entries go first, then least recently used
+        rows = conn.execute("SELECT key, size FROM cache WHERE key != ? "
+                            "ORDER BY expires_at > ?, accessed_at", (keep, now)).fetchall()
+        victims = []
+        for k, size in rows:
+            if total <= self.max_bytes:
+                break
+            victims.append((k,))
+            total -= size
+        conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+
+    def delete(self, key):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def acquire(self, key, owner, lease=LOCK_LEASE):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM locks WHERE key = ? AND expires_at <= ?", (key, now))
+                cur = conn.execute("INSERT OR IGNORE INTO locks (key, owner, expires_at) VALUES (?, ?, ?)",
+                                   (key, owner, now + lease))
+                conn.execute("COMMIT")
+                return cur.rowcount == 1
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def release(self, key, owner):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM locks WHERE key = ? AND owner = ?", (key, owner))
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_cache_backend() -> CacheBackend:
+    """Process-wide backend chosen by FINANCEBOT_CACHE_BACKEND (sqlite or memory)"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if CACHE_BACKEND == "memory":
+                _backend = MemoryBackend()
+            else:
+                _backend = SQLiteBackend()
+        return _backend
+
+
+def get_or_compute(key: str, compute: Callable[[], Any], ttl: float,
+                   cache_if: Optional[Callable[[Any], bool]] = None,
+                   backend: Optional[CacheBackend] = None, wait: float = LOCK_LEASE,
+                   stale: Optional[Callable[[Any, float], Any]] = None,
+                   busy: Optional[Callable[[], Any]] = None) -> Any:
+    """Return the cached value for key, computing it at most once across processes.
+
+    Only the worker holding the key's lock calls `compute`; the others wait
+    up to `wait` seconds for its result instead of hitting the upstream
+    themselves. With `stale`, a waiter returns `stale(value, stored_at)` for
+    an expired entry at once rather than waiting (stale-while-revalidate).
+    With `busy`, a waiter whose wait runs out, or whose lock holder finished
+    without caching anything, returns `busy()` instead of repeating the call.
+    """
+    backend = backend or get_cache_backend()
+    value, _ = backend.get(key)
+    if value is not MISS:
+        return value
+
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    waited = False
+    while not backend.acquire(key, owner):
+        waited = True
+        value, _ = backend.get(key)
+        if value is not MISS:
+            return value
+        if stale is not None:
+            value, stored_at = backend.get(key, allow_expired=True)
+            if value is not MISS:
+                return stale(value, stored_at)
+        if time.monotonic() > deadline:
+            if busy is not None:
+                return busy()
+            # Lock holder is stuck; fetch rather than wait forever
+            logger.warning(f"Single-flight wait timed out for {key}")
+            return compute()
+        time.sleep(POLL_INTERVAL)
+
+    try:
+        # Another worker may have filled it between our miss and the lock
+        value, _ = backend.get(key)
+        if value is not MISS:
+            return value
+        if waited and busy is not None:
+            # The previous holder gave up without a result; don't repeat its call
+            return busy()
+        value = compute()
+        if cache_if is None or cache_if(value):
+            try:
+                backend.set(key, value, ttl)
+            except Exception as e:
+                logger.warning(f"Could not cache {key}: {str(e)}")
+        return value
+    finally:
+        backend.release(key, owner)
+
+
+def make_key(namespace: str, args: tuple, kwargs: dict) -> str:
+    digest = hashlib.sha256(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def shared_cache(ttl: float, namespace: Optional[str] = None,
+                 cache_if: Optional[Callable[[Any], bool]] = None):
+    """Cache a function's results in the shared backend, like st.cache_data but across processes"""
+    def decorator(fn):
+        ns = namespace or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return get_or_compute(make_key(ns, args, kwargs), lambda: fn(*args, **kwargs), ttl, cache_if)
+
+        return wrapper
+    return decorator
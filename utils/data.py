@@ -1,28 +1,31 @@
 import yfinance as yf
 import pandas as pd
-import streamlit as st
 from typing import Dict, Any
+from utils.fetch import resilient_cache, SOURCE_BUDGETS
 
-@st.cache_data(ttl=60*15)
+@resilient_cache("yahoo_history", ttl=60*15, cache_if=lambda df: not df.empty,
+                 fallback=lambda *args, **kwargs: pd.DataFrame())
 def get_stock_data(symbol: str, period: str = "1mo") -> pd.DataFrame:
-    try:
-        return yf.Ticker(symbol).history(period=period).reset_index()
-    except Exception:
-        return pd.DataFrame()
+    # Transport errors propagate to the breaker; an unknown symbol is just an empty frame
+    return yf.Ticker(symbol).history(period=period, timeout=SOURCE_BUDGETS["yahoo_history"]).reset_index()
 
-@st.cache_data(ttl=60*5)
+@resilient_cache("yahoo", ttl=60*5, cache_if=lambda r: r["status"] == "success",
+                 fallback=lambda *args, **kwargs: {"price": 0, "status": "error", "message": "Price data unavailable"})
 def get_realtime_price(symbol: str) -> Dict[str, Any]:
-    try:
-        data = yf.Ticker(symbol).fast_info
-        return {
-            "price": data.last_price,
-            "change": data.last_price - data.previous_close,
-            "change_percent": (data.last_price - data.previous_close)/data.previous_close*100,
-            "status": "success"
-        }
-    except Exception:
+    # fast_info fetches without a timeout; the last two daily closes carry the same numbers
+    history = yf.Ticker(symbol).history(period="5d", timeout=SOURCE_BUDGETS["yahoo"])
+    closes = history["Close"].dropna() if "Close" in history else pd.Series(dtype=float)
+    if len(closes) < 2:
+        # Unknown or delisted symbol: a per-symbol result, not an upstream failure
         return {
             "price": 0,
             "status": "error",
             "message": "Price data unavailable"
-        }
\ No newline at end of file
+        }
+    last_price, previous_close = float(closes.iloc[-1]), float(closes.iloc[-2])
+    return {
+        "price": last_price,
+        "change": last_price - previous_close,
+        "change_percent": (last_price - previous_close)/previous_close*100,
+        "status": "success"
+    }
\ No newline at end of file
@@ -0,0 +1,229 @@
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+from utils.cache import MISS, get_cache_backend, get_or_compute, make_key
+
+logger = logging.getLogger(__name__)
+
+# Seconds an upstream may take before the page stops waiting for it
+SOURCE_BUDGETS = {
+    "screener": 5.0,
+    "screener_search": 3.0,
+    "economictimes": 3.0,
+    "yahoo": 4.0,
+    "yahoo_history": 5.0,
+    "yahoo_portfolio": 45.0,  # one multi-symbol download, on demand from the risk tab
+    "yahoo_news": 3.0,
+}
+DEFAULT_BUDGET = 5.0
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 30.0
+BULKHEAD_SIZE = 4          # concurrent calls per source, so one hung upstream can't starve the others
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when a source is open-circuited, saturated, over budget, failing or returned a bad payload"""
+
+    def __init__(self, source: str, reason: str, value: Any = None):
+        super().__init__(f"{source}: {reason}")
+        self.source = source
+        self.value = value
+
+
+class CircuitBreaker:
+    """Stops calling a source after repeated failures, then lets one trial call through"""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_response(self):
+        """The upstream answered, but with a per-key bad payload: not a failure.
+
+        A half-open trial that gets any answer proves the source is back.
+        """
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "closed"
+                self.failures = 0
+
+
+class Bulkhead:
+    """A source's own worker threads; calls beyond its size are refused instead of queued"""
+
+    def __init__(self, source: str, size: int = BULKHEAD_SIZE):
+        self._slots = threading.BoundedSemaphore(size)
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"fetch-{source}")
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Optional[Future]:
+        if not self._slots.acquire(blocking=False):
+            return None
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_bulkheads: Dict[str, Bulkhead] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(source: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if source not in _breakers:
+            _breakers[source] = CircuitBreaker()
+        return _breakers[source]
+
+
+def get_bulkhead(source: str) -> Bulkhead:
+    with _breakers_lock:
+        if source not in _bulkheads:
+            _bulkheads[source] = Bulkhead(source)
+        return _bulkheads[source]
+
+
+def guarded_call(source: str, fn: Callable, *args,
+                 is_good: Optional[Callable[[Any], bool]] = None, **kwargs) -> Any:
+    """Call fn within the source's latency budget, bulkhead and circuit breaker.
+
+    Timeouts and exceptions count against the breaker. A result rejected by
+    `is_good` (an unknown ticker, an empty feed) is about the key, not the
+    source, so it is raised for the caller to fall back on but leaves the
+    breaker alone. `fn` must put its own socket timeout on the upstream
+    call; the budget here only stops the caller waiting.
+    """
+    breaker = get_breaker(source)
+    if not breaker.allow():
+        raise UpstreamUnavailable(source, "circuit open")
+
+    budget = SOURCE_BUDGETS.get(source, DEFAULT_BUDGET)
+    future = get_bulkhead(source).submit(fn, *args, **kwargs)
+    if future is None:
+        # Every slot is held by a call that has not returned; don't pile on
+        breaker.record_failure()
+        raise UpstreamUnavailable(source, "too many calls in flight")
+    try:
+        value = future.result(timeout=budget)
+    except FutureTimeout:
+        breaker.record_failure()
+        raise UpstreamUnavailable(source, f"exceeded {budget:g}s budget")
+    except Exception as e:
+        breaker.record_failure()
+        raise UpstreamUnavailable(source, str(e))
+
+    if is_good is not None and not is_good(value):
+        breaker.record_response()
+        raise UpstreamUnavailable(source, "bad payload", value)
+    breaker.record_success()
+    return value
+
+
+def mark_stale(value: Any, fetched_at: float) -> Any:
+    """Flag a last-good payload so the UI can say it is not fresh"""
+    if isinstance(value, dict):
+        value.update({"stale": True, "fetched_at": fetched_at})
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, dict):
+                item.update({"stale": True, "fetched_at": fetched_at})
+    elif isinstance(value, pd.DataFrame):
+        value.attrs.update({"stale": True, "fetched_at": fetched_at})
+    return value
+
+
+def is_stale(value: Any) -> bool:
+    if isinstance(value, dict):
+        return bool(value.get("stale"))
+    if isinstance(value, list):
+        return any(isinstance(item, dict) and item.get("stale") for item in value)
+    if isinstance(value, pd.DataFrame):
+        return bool(value.attrs.get("stale"))
+    return False
+
+
+def fetched_at(value: Any) -> Optional[float]:
+    if isinstance(value, dict):
+        return value.get("fetched_at")
+    if isinstance(value, list):
+        return next((item.get("fetched_at") for item in value if isinstance(item, dict)), None)
+    if isinstance(value, pd.DataFrame):
+        return value.attrs.get("fetched_at")
+    return None
+
+
+def resilient_cache(source: str, ttl: float, cache_if: Optional[Callable[[Any], bool]] = None,
+                    fallback: Optional[Callable[..., Any]] = None, namespace: Optional[str] = None):
+    """shared_cache plus latency budgets, a circuit breaker and last-good fallback.
+
+    On a fresh cache hit nothing changes. On a miss the upstream is called
+    within its budget; if that fails the last good payload (kept past its
+    TTL by the cache backend) is returned marked stale. With no snapshot,
+    the function's own error value or `fallback(*args)` is returned.
+
+    While one caller refreshes a key, the others get the last good payload
+    straight away, or wait at most the source budget when there is none.
+    """
+    def decorator(fn):
+        ns = namespace or f"{fn.__module__}.{fn.__qualname__}"
+
+        def busy():
+            raise UpstreamUnavailable(source, "concurrent fetch did not return a result")
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = make_key(ns, args, kwargs)
+            budget = SOURCE_BUDGETS.get(source, DEFAULT_BUDGET)
+            try:
+                return get_or_compute(key, lambda: guarded_call(source, fn, *args, is_good=cache_if, **kwargs),
+                                      ttl, cache_if, wait=budget, stale=mark_stale, busy=busy)
+            except UpstreamUnavailable as e:
+                logger.warning(f"Upstream unavailable, serving last good data: {str(e)}")
+                value, stored_at = get_cache_backend().get(key, allow_expired=True)
+                if value is not MISS:
+                    return mark_stale(value, stored_at)
+                if e.value is not None:
+                    return e.value
+                return fallback(*args, **kwargs) if fallback else None
+
+        return wrapper
+    return decorator
+
+
+def stale_message(value: Any, source_name: str) -> Optional[str]:
+    """User-facing note for stale payloads, or None when the data is fresh"""
+    if not is_stale(value):
+        return None
+    ts = fetched_at(value)
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)) if ts else "an earlier fetch"
+    return f"{source_name} is slow or unavailable right now. Showing data from {when}."
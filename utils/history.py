@@ -0,0 +1,229 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from typing import Callable, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB = os.getenv("FINANCEBOT_HISTORY_DB", "chat_history.db")
+RENDER_LIMIT = 20          # messages rendered per page
+CONTEXT_WINDOW = 6         # raw messages sent to the model after the summary
+SUMMARY_BATCH = CONTEXT_WINDOW  # messages folded into the summary per summarizer call
+SUMMARY_MAX_CHARS = 1500
+
+Summarizer = Callable[[str, List[Dict[str, str]]], str]
+
+
+def extractive_summary(previous: str, messages: List[Dict[str, str]],
+                       max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """Fold messages into the running summary without calling a model"""
+    lines = [previous] if previous else []
+    for msg in messages:
+        content = " ".join(msg["content"].split())
+        lines.append(f"{msg['role']}: {content[:200]}")
+    summary = "\n".join(lines)
+    # Keep the most recent part when the summary outgrows its budget
+    return summary[-max_chars:]
+
+
+class ChatHistory:
+    """SQLite-backed chat history keyed by session and user.
+
+    Messages that fall out of the model's context window are folded into a
+    running summary, so the prompt size stays constant as the chat grows.
+    """
+
+    def __init__(self, db_path: str = HISTORY_DB):
+        self.db_path = db_path
+        self._summarizing = set()
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session "
+                         "ON messages (session_id, user_id, id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    session_id TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    upto_id INTEGER NOT NULL,
+                    PRIMARY KEY (session_id, user_id)
+                )""")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def append(self, session_id: str, user_id: str, role: str, content: str) -> int:
+        with closing(self._connect()) as conn, conn:
+            cur = conn.execute(
+                "INSERT INTO messages (session_id, user_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, user_id, role, content, time.time()))
+            return cur.lastrowid
+
+    def count(self, session_id: str, user_id: str) -> int:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT COUNT(*) FROM messages WHERE session_id = ? AND user_id = ?",
+                               (session_id, user_id)).fetchone()
+            return row[0]
+
+    def recent(self, session_id: str, user_id: str, limit: int = RENDER_LIMIT,
+               after_id: int = 0) -> List[Dict[str, str]]:
+        """Return the last `limit` messages (newer than `after_id`) in chronological order"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, role, content FROM messages WHERE session_id = ? AND user_id = ? AND id > ? "
+                "ORDER BY id DESC LIMIT ?",
+                (session_id, user_id, after_id, limit)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def get_summary(self, session_id: str, user_id: str) -> Tuple[str, int]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT summary, upto_id FROM summaries WHERE session_id = ? AND user_id = ?",
+                               (session_id, user_id)).fetchone()
+        return (row["summary"], row["upto_id"]) if row else ("", 0)
+
+    def set_summary(self, session_id: str, user_id: str, summary: str, upto_id: int):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO summaries (session_id, user_id, summary, upto_id) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (session_id, user_id) DO UPDATE SET summary = excluded.summary, "
+                "upto_id = excluded.upto_id WHERE excluded.upto_id > summaries.upto_id",
+                (session_id, user_id, summary, upto_id))
+
+    def context(self, session_id: str, user_id: str, window: int = CONTEXT_WINDOW,
+                batch: int = SUMMARY_BATCH) -> Tuple[str, List[Dict[str, str]]]:
+        """Return (running summary, messages not yet in it) to send to the model.
+
+        The summary is refreshed in batches, so up to `window + batch`
+        messages may be outstanding; all of them are included.
+        """
+        summary, upto_id = self.get_summary(session_id, user_id)
+        return summary, self.recent(session_id, user_id, window + batch, after_id=upto_id)
+
+    def pending_for_summary(self, session_id: str, user_id: str,
+                            window: int = CONTEXT_WINDOW) -> Tuple[str, List[Dict[str, str]]]:
+        """Messages that have left the context window but are not yet summarized"""
+        summary, upto_id = self.get_summary(session_id, user_id)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, role, content FROM messages WHERE session_id = ? AND user_id = ? AND id > ? "
+                "ORDER BY id", (session_id, user_id, upto_id)).fetchall()
+        rows = [dict(row) for row in rows]
+        return summary, rows[:-window] if len(rows) > window else []
+
+    def needs_summary(self, session_id: str, user_id: str, window: int = CONTEXT_WINDOW,
+                      batch: int = SUMMARY_BATCH) -> bool:
+        """Whether a full batch has left the context window"""
+        return len(self.pending_for_summary(session_id, user_id, window)[1]) >= batch
+
+    def refresh_summary(self, session_id: str, user_id: str, summarize: Summarizer = extractive_summary,
+                        window: int = CONTEXT_WINDOW, batch: int = SUMMARY_BATCH):
+        """Fold messages that left the context window into the running summary.
+
+        Nothing happens until at least `batch` messages are pending, so a
+        model-backed summarizer is called once per batch rather than per turn.
+        """
+        key = (session_id, user_id)
+        with self._lock:
+            if key in self._summarizing:
+                return
+            self._summarizing.add(key)
+        try:
+            summary, pending = self.pending_for_summary(session_id, user_id, window)
+            if len(pending) >= batch:
+                try:
+                    summary = summarize(summary, pending)
+                except Exception as e:
+                    logger.warning(f"Summarizer failed, using extractive summary: {str(e)}")
+                    summary = extractive_summary(summary, pending)
+                self.set_summary(session_id, user_id, summary, pending[-1]["id"])
+        finally:
+            with self._lock:
+                self._summarizing.discard(key)
+
+    def refresh_summary_async(self, session_id: str, user_id: str, summarize: Summarizer = extractive_summary,
+                              window: int = CONTEXT_WINDOW, batch: int = SUMMARY_BATCH):
+        """Run refresh_summary off the request path so turns don't wait on it"""
+        threading.Thread(target=self.refresh_summary, args=(session_id, user_id, summarize, window, batch),
+                         daemon=True).start()
+
+
+def llm_summarizer(api_key: str) -> Summarizer:
+    """Summarizer that asks the model, queued behind interactive chat"""
+    from utils.llm import chat_completion, PRIORITY_BACKGROUND
+
+    def summarize(previous: str, messages: List[Dict[str, str]]) -> str:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        response = chat_completion(
+            api_key,
+            priority=PRIORITY_BACKGROUND,
+            model="gpt-3.5-turbo",
+            messages=[{
+                "role": "system",
+                "content": "Update the running summary of a stock-advice chat. Keep tickers, figures and the "
+                           "user's goals. Reply with the summary only, under 150 words."
+            }, {
+                "role": "user",
+                "content": f"Summary so far:\n{previous or '(empty)'}\n\nNew messages:\n{transcript}"
+            }],
+            temperature=0,
+            max_tokens=250
+        )
+        return response.choices[0].message.content.strip()[:SUMMARY_MAX_CHARS]
+
+    return summarize
+
+
+_store: Optional[ChatHistory] = None
+_store_lock = threading.Lock()
+
+
+def get_history_store() -> ChatHistory:
+    """Return the process-wide history store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ChatHistory()
+        return _store
+
+
+def get_chat_identity() -> Tuple[str, str]:
+    """Return (session_id, user_id), keeping the session id in the URL so reloads resume the chat"""
+    session_id = st.query_params.get("sid")
+    if not session_id:
+        session_id = uuid.uuid4().hex
+        st.query_params["sid"] = session_id
+    user_id = st.query_params.get("user", "anonymous")
+    return session_id, user_id
+
+
+def render_history(store: ChatHistory, session_id: str, user_id: str, key: str = "history_limit"):
+    """Render the last N messages, with a button to load older ones on demand"""
+    if key not in st.session_state:
+        st.session_state[key] = RENDER_LIMIT
+
+    total = store.count(session_id, user_id)
+    if total > st.session_state[key]:
+        if st.button(f"Load earlier messages ({total - st.session_state[key]} hidden)", key=f"{key}_more"):
+            st.session_state[key] += RENDER_LIMIT
+
+    for msg in store.recent(session_id, user_id, st.session_state[key]):
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
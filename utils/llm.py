@@ -0,0 +1,199 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Optional, Tuple
+
+import openai
+from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+# Lower number = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+INTERACTIVE_TIMEOUT = 30.0   # seconds a chat turn waits, including any rate-limit pause
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+
+# Point at a local OpenAI-compatible server (e.g. a fake for load tests)
+BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+_clients: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    """Return the process-wide client for this key, creating it once.
+
+    The client keeps its own HTTP connection pool, so sharing it across
+    sessions reuses connections. Retries are disabled here because the
+    request queue handles them with rate-limit awareness.
+    """
+    base_url = base_url or BASE_URL
+    key = (api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+            _clients[key] = client
+        return client
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse rate-limit durations such as '1.5', '20ms', '6m0s' into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value):
+        matched = True
+        amount = float(amount)
+        if unit == "ms":
+            total += amount / 1000
+        elif unit == "s":
+            total += amount
+        elif unit == "m":
+            total += amount * 60
+        elif unit == "h":
+            total += amount * 3600
+    return total if matched else None
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+class LLMRequestQueue:
+    """Priority queue in front of the chat completions API.
+
+    A fixed pool of worker threads bounds concurrency. Rate-limit headers
+    from each response pause dispatch when the quota is exhausted, and
+    throttled or transient failures are retried with jittered backoff.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, max_retries: int = MAX_RETRIES):
+        self.max_retries = max_retries
+        self._heap: List[Tuple[int, int, Dict[str, Any]]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._paused_until = 0.0
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"llm-worker-{i}", daemon=True)
+            for i in range(max_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, api_key: str, priority: int = PRIORITY_INTERACTIVE, **kwargs) -> Future:
+        """Queue a chat completion request and return a future for its result"""
+        future = Future()
+        job = {"api_key": api_key, "kwargs": kwargs, "future": future}
+        with self._cond:
+            heapq.heappush(self._heap, (priority, next(self._counter), job))
+            self._cond.notify()
+        return future
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def _pause(self, seconds: float):
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _next_job(self) -> Dict[str, Any]:
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if self._heap and wait <= 0:
+                    return heapq.heappop(self._heap)[2]
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            future = job["future"]
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._execute(job))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _observe_headers(self, headers):
+        """Pause dispatch until reset when the remaining quota hits zero"""
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is not None and remaining.strip() == "0":
+                reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset:
+                    self._pause(reset)
+
+    def _execute(self, job: Dict[str, Any]):
+        client = get_client(job["api_key"])
+        attempt = 0
+        while True:
+            try:
+                raw = client.chat.completions.with_raw_response.create(**job["kwargs"])
+                self._observe_headers(raw.headers)
+                return raw.parse()
+            except openai.RateLimitError as e:
+                headers = e.response.headers if e.response is not None else {}
+                delay = _parse_duration(headers.get("retry-after"))
+                if delay is None:
+                    delay = _parse_duration(headers.get("x-ratelimit-reset-requests"))
+                # Quota exhausted is not something a retry will fix
+                if getattr(e, "code", None) == "insufficient_quota" or attempt >= self.max_retries:
+                    raise
+                delay = max(delay or 0.0, _backoff(attempt))
+                self._pause(delay)
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = _backoff(attempt)
+                logger.warning(f"Transient LLM error, retrying in {delay:.2f}s: {str(e)}")
+            attempt += 1
+            time.sleep(delay)
+
+
+_queue: Optional[LLMRequestQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> LLMRequestQueue:
+    """Return the process-wide request queue"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = LLMRequestQueue()
+        return _queue
+
+
+def chat_completion(api_key: str, priority: int = PRIORITY_INTERACTIVE,
+                    timeout: Optional[float] = None, **kwargs):
+    """Run a chat completion through the shared queue and wait for it.
+
+    On timeout the request is cancelled if it has not been dispatched yet,
+    so it does not spend quota after the caller has given up.
+    """
+    future = get_queue().submit(api_key, priority=priority, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise
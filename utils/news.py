@@ -1,13 +1,19 @@
 import feedparser
+import requests
 from typing import List, Dict
+from utils.fetch import resilient_cache, SOURCE_BUDGETS
 
+@resilient_cache("yahoo_news", ttl=60*10, cache_if=lambda items: bool(items) and items[0]["link"] != "#",
+                 fallback=lambda *args, **kwargs: [{"title": "News feed unavailable", "link": "#"}])
 def get_finance_news(symbol: str = "^GSPC") -> List[Dict[str, str]]:
-    try:
-        feed = feedparser.parse(f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={symbol}")
-        return [{
-            "title": entry.title,
-            "link": entry.link,
-            "published": entry.get("published", "")
-        } for entry in feed.entries[:5]]
-    except Exception:
-        return [{"title": "News feed unavailable", "link": "#"}]
\ No newline at end of file
+    # feedparser has no socket timeout, so fetch the feed ourselves and let
+    # transport errors reach the circuit breaker
+    response = requests.get(f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={symbol}",
+                            timeout=SOURCE_BUDGETS["yahoo_news"])
+    response.raise_for_status()
+    feed = feedparser.parse(response.content)
+    return [{
+        "title": entry.title,
+        "link": entry.link,
+        "published": entry.get("published", "")
+    } for entry in feed.entries[:5]]
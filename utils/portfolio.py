@@ -0,0 +1,100 @@
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from utils.fetch import resilient_cache, SOURCE_BUDGETS
+
+TRADING_DAYS = 252
+
+
+@resilient_cache("yahoo_portfolio", ttl=60*60*6, cache_if=lambda df: not df.empty,
+                 fallback=lambda *args, **kwargs: pd.DataFrame())
+def load_closes(symbols: List[str], period: str = "10y") -> pd.DataFrame:
+    """Daily closes for many symbols in one request, dates x symbols"""
+    data = yf.download(symbols, period=period, interval="1d", auto_adjust=True,
+                       progress=False, threads=True, timeout=SOURCE_BUDGETS["yahoo_portfolio"])
+    if data is None or data.empty:
+        # Every symbol unknown or without history: handled per key by cache_if
+        return pd.DataFrame()
+    closes = data["Close"]
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(symbols[0])
+    return closes.reindex(columns=symbols)
+
+
+def align_closes(closes: pd.DataFrame, min_obs: int = 20) -> pd.DataFrame:
+    """Forward-fill gaps (holidays, suspensions) and drop symbols with too little history"""
+    closes = closes.sort_index().ffill()
+    return closes.loc[:, closes.notna().sum() >= min_obs]
+
+
+def compute_risk(closes: pd.DataFrame, benchmark: Optional[str] = None, confidence: float = 0.95,
+                 weights: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Risk statistics for every symbol at once.
+
+    All statistics are matrix operations over the dates x symbols array.
+    Symbols listed later than others keep their NaNs, and covariances use
+    pairwise-complete observations.
+    """
+    symbols = list(closes.columns)
+    prices = closes.to_numpy(dtype=float)
+
+    returns = prices[1:] / prices[:-1] - 1
+    valid = np.isfinite(returns)
+    counts = valid.sum(axis=0)
+    filled = np.where(valid, returns, 0.0)
+
+    mean = filled.sum(axis=0) / np.maximum(counts, 1)
+    dev = np.where(valid, returns - mean, 0.0)
+    mask = valid.astype(float)
+    pair_counts = mask.T @ mask
+    cov = (dev.T @ dev) / np.maximum(pair_counts - 1, 1)
+
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.outer(std, std)
+    np.fill_diagonal(corr, 1.0)
+
+    running_max = np.fmax.accumulate(prices, axis=0)
+    with np.errstate(invalid="ignore"):
+        max_drawdown = np.nanmin(prices / running_max - 1, axis=0)
+
+    z = NormalDist().inv_cdf(confidence)
+    hist_var = -np.nanquantile(returns, 1 - confidence, axis=0)
+    param_var = -(mean - z * std)
+
+    stats = pd.DataFrame({
+        "Ann. Return": mean * TRADING_DAYS,
+        "Ann. Volatility": std * np.sqrt(TRADING_DAYS),
+        "Max Drawdown": max_drawdown,
+        f"Hist. VaR {confidence:.0%}": hist_var,
+        f"Param. VaR {confidence:.0%}": param_var,
+    }, index=symbols)
+
+    if benchmark in symbols:
+        b = symbols.index(benchmark)
+        stats["Beta"] = cov[:, b] / cov[b, b]
+
+    if weights is None:
+        weights = np.full(len(symbols), 1 / len(symbols))
+    port_returns = filled @ weights
+    port_std = float(np.sqrt(weights @ cov @ weights))
+    port_value = np.cumprod(1 + port_returns)
+    portfolio = {
+        "Ann. Return": float(weights @ mean) * TRADING_DAYS,
+        "Ann. Volatility": port_std * float(np.sqrt(TRADING_DAYS)),
+        "Max Drawdown": float(np.min(port_value / np.maximum.accumulate(port_value) - 1)),
+        f"Hist. VaR {confidence:.0%}": float(-np.quantile(port_returns, 1 - confidence)),
+        f"Param. VaR {confidence:.0%}": float(-(weights @ mean - z * port_std)),
+    }
+
+    return {
+        "returns": pd.DataFrame(returns, index=closes.index[1:], columns=symbols),
+        "covariance": pd.DataFrame(cov, index=symbols, columns=symbols),
+        "correlation": pd.DataFrame(corr, index=symbols, columns=symbols),
+        "stats": stats,
+        "portfolio": portfolio,
+    }
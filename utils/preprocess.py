@@ -0,0 +1,192 @@
+import argparse
+import itertools
+import logging
+import os
+import re
+import string
+import time
+from collections import deque
+from functools import lru_cache
+from multiprocessing import Pool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HTML_TAGS = re.compile(r'<.*?>')
+URLS = re.compile(r'https?://\S+|www\.\S+')
+PUNCTUATION = str.maketrans('', '', string.punctuation)
+# Every token TextBlob(text).correct() would see once punctuation is gone
+WORD = re.compile(r'\w+')
+
+CHAT_WORDS = {
+    "AFAIK": "As Far As I Know",
+    "AFK": "Away From Keyboard",
+    "ASAP": "As Soon As Possible",
+    "FYI": "For Your Information",
+    "BRB": "Be Right Back",
+    "BTW": "By The Way",
+    "OMG": "Oh My God",
+    "IMO": "In My Opinion",
+    "LOL": "Laugh Out Loud",
+    "TTYL": "Talk To You Later",
+    "GTG": "Got To Go",
+    "TTYT": "Talk To You Tomorrow",
+    "IDK": "I Don't Know",
+    "TMI": "Too Much Information",
+    "IMHO": "In My Humble Opinion",
+    "ICYMI": "In Case You Missed It",
+    "FAQ": "Frequently Asked Questions",
+    "TGIF": "Thank God It's Friday",
+    "FYA": "For Your Action",
+}
+CHAT_PATTERN = re.compile(r'(?<!\S)(' + '|'.join(CHAT_WORDS) + r')(?!\S)', re.IGNORECASE)
+
+CHUNK_SIZE = 1000
+
+
+def remove_html_tags(text: str) -> str:
+    return HTML_TAGS.sub('', text)
+
+
+def remove_urls(text: str) -> str:
+    return URLS.sub('', text)
+
+
+def remove_punctuation(text: str) -> str:
+    return text.translate(PUNCTUATION)
+
+
+def expand_chat_word(match: re.Match) -> str:
+    return CHAT_WORDS[match.group(1).upper()]
+
+
+def chat_conversion(text: str) -> str:
+    return CHAT_PATTERN.sub(expand_chat_word, text)
+
+
+@lru_cache(maxsize=200_000)
+def correct_word(word: str) -> str:
+    """TextBlob correction, memoized because corpus vocabulary repeats heavily"""
+    from textblob import Word
+    return str(Word(word).correct())
+
+
+def correct_match(match: re.Match) -> str:
+    return correct_word(match.group(0))
+
+
+def correct_spelling(text: str) -> str:
+    return WORD.sub(correct_match, text)
+
+
+def clean_chunk(docs: List[str], spelling: bool = True) -> List[str]:
+    """Run every step over a chunk with vectorized pandas string operations.
+
+    The chat and spelling steps share their patterns and replacements with
+    chat_conversion and correct_spelling. Spelling is corrected per token
+    like the notebook's TextBlob(text).correct(). correct_word is memoized,
+    so a repeated word costs only a cache lookup.
+    """
+    series = pd.Series(docs, dtype=object).fillna('').astype(str)
+    series = (series.str.lower()
+              .str.replace(HTML_TAGS, '', regex=True)
+              .str.replace(URLS, '', regex=True)
+              .str.translate(PUNCTUATION)
+              .str.replace(CHAT_PATTERN, expand_chat_word, regex=True))
+    if spelling:
+        series = series.str.replace(WORD, correct_match, regex=True)
+    return series.tolist()
+
+
+def iter_chunks(docs: Iterable[str], size: int = CHUNK_SIZE) -> Iterator[List[str]]:
+    iterator = iter(docs)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def preprocess_stream(docs: Iterable[str], chunk_size: int = CHUNK_SIZE, processes: Optional[int] = None,
+                      spelling: bool = True,
+                      report: Optional[Callable[[Dict[str, Any]], None]] = None) -> Iterator[str]:
+    """Clean documents lazily, in order, across worker processes.
+
+    Only a few chunks per worker are in flight at once, so memory stays flat
+    however large the input is. `report` is called after every chunk with
+    the running document count and throughput in documents per second.
+    """
+    if spelling:
+        # Fail here rather than inside every worker
+        import textblob  # noqa: F401
+
+    started = time.perf_counter()
+    done = 0
+
+    def finished(cleaned: List[str]) -> List[str]:
+        nonlocal done
+        done += len(cleaned)
+        if report:
+            elapsed = time.perf_counter() - started
+            report({"docs": done, "elapsed": elapsed, "docs_per_sec": done / elapsed if elapsed else 0.0})
+        return cleaned
+
+    if processes == 1:
+        for chunk in iter_chunks(docs, chunk_size):
+            yield from finished(clean_chunk(chunk, spelling))
+        return
+
+    processes = processes or os.cpu_count() or 1
+    pool = Pool(processes)
+    max_pending = 2 * processes
+    pending = deque()
+    try:
+        for chunk in iter_chunks(docs, chunk_size):
+            pending.append(pool.apply_async(clean_chunk, (chunk, spelling)))
+            if len(pending) >= max_pending:
+                yield from finished(pending.popleft().get())
+        while pending:
+            yield from finished(pending.popleft().get())
+    finally:
+        pool.terminate()
+
+
+def preprocess_csv(path: str, column: str, output: str, chunk_size: int = CHUNK_SIZE,
+                   processes: Optional[int] = None, spelling: bool = True) -> Dict[str, Any]:
+    """Stream a CSV column through the pipeline into `output` and return throughput stats"""
+    stats: Dict[str, Any] = {"docs": 0, "elapsed": 0.0, "docs_per_sec": 0.0}
+
+    def docs():
+        for frame in pd.read_csv(path, usecols=[column], chunksize=chunk_size * 10):
+            yield from frame[column].tolist()
+
+    def report(update):
+        stats.update(update)
+        logger.info(f"{update['docs']} docs, {update['docs_per_sec']:.0f} docs/s")
+
+    cleaned = preprocess_stream(docs(), chunk_size, processes, spelling, report)
+    header = True
+    for batch in iter_chunks(cleaned, chunk_size * 10):
+        pd.DataFrame({column: batch}).to_csv(output, mode='w' if header else 'a', header=header, index=False)
+        header = False
+    return stats
+
+
+if __name__ == "__main__":
+    # python -m utils.preprocess data.csv --column review --output clean.csv
+    parser = argparse.ArgumentParser(description="Clean a text column for chatbot ingestion")
+    parser.add_argument("path")
+    parser.add_argument("--column", default="review")
+    parser.add_argument("--output", default="clean.csv")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--no-spelling", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    result = preprocess_csv(args.path, args.column, args.output, args.chunk_size, args.processes,
+                            not args.no_spelling)
+    print(f"Processed {result['docs']} documents in {result['elapsed']:.1f}s "
+          f"({result['docs_per_sec']:.0f} docs/s)")
@@ -0,0 +1,148 @@
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Metric intents answered straight from the scraped stock dict, in answer order
+METRIC_INTENTS = [
+    ("price", re.compile(r"\b(price(?!\s*[-/]?\s*(to[- ])?(earnings|book))|trading at|trade at|quote)\b")),
+    ("change_pct", re.compile(r"\b(change|up or down|moved?|today'?s move)\b")),
+    ("market_cap", re.compile(r"\b(market ?cap|mcap|m-cap|market capitali[sz]ation)\b")),
+    ("pe_ratio", re.compile(r"\bp\s*/?\s*e\b|\bpe ratio\b|price\s*(/|[- ]to[- ])\s*earnings|\bearnings multiple\b")),
+    ("price_to_book", re.compile(r"\bp\s*/\s*b\b|\bpb ratio\b|price\s*(/|[- ]to[- ])\s*book|\bbook value\b")),
+    ("dividend_yield", re.compile(r"\bdividends?\b")),
+    ("high_low", re.compile(r"\b52[- ]?w(ee)?k\b|\b(high|low|highest|lowest)\b")),
+    ("cagr", re.compile(r"\bcagr\b|\bcompound(ed)? (annual )?growth\b")),
+    ("sector", re.compile(r"\b(sector|industry)\b")),
+]
+
+ANALYSIS_INTENT = re.compile(r"\b(analysis|analy[sz]e|overview|summary|valuation|undervalued|overvalued|cheap|expensive)\b")
+
+# Anything asking for judgement, comparison, explanation or a definition goes to the LLM
+OPEN_ENDED = re.compile(
+    r"\b(should|would|could|why|explain|mean|means|meaning|define|definition|good|bad|ideal|normal|"
+    r"compare|compared|comparison|than|difference|versus|vs|better|best|worse|worst|recommend|advice|advise|"
+    r"predict|forecast|future|outlook|expect|will|buy|sell|hold|invest|strategy|risk|portfolio|news|think|"
+    r"opinion)\b"
+)
+
+# A time range asks about history the scraped snapshot doesn't have, except
+# for metrics that are themselves ranges
+TIME_RANGE = re.compile(r"\b(over|past|last|since|ago|during|between|history|historical|trend)\b|"
+                        r"\b\d+\s*(days?|weeks?|wks?|months?|years?|yrs?)\b")
+RANGE_INTENTS = {"high_low", "cagr"}
+
+# "P/E for the IT sector" is about a sector, not the selected company
+SECTOR_WIDE = re.compile(r"\b(for|of|in|across) (the )?[\w&]+ (sector|industry)\b")
+
+# Every word a plain lookup may use; anything else (another company, a
+# ticker we don't know) sends the question to the LLM
+LOOKUP_WORDS = set("""
+    what whats is are was the a an of for on its it this that stock share shares company current currently
+    now today todays latest right tell me show give get please much how which does do in at s and or
+    price trading trade quote change up down move moved market cap mcap m capitalisation capitalization
+    p e pe ratio to earnings earning multiple b pb book value dividend dividends yield week wk w high low
+    highest lowest year years yearly annual yr yrs cagr compound compounded growth sector industry
+    analysis analyse analyze overview summary valuation undervalued overvalued cheap expensive
+""".split())
+
+MAX_LOOKUP_WORDS = 14
+
+METRIC_LABELS = {
+    "price": "current price",
+    "change_pct": "price change",
+    "market_cap": "market cap",
+    "pe_ratio": "P/E ratio",
+    "price_to_book": "price to book value",
+    "dividend_yield": "dividend yield",
+    "cagr": "CAGR",
+    "sector": "sector",
+}
+
+
+def classify(question: str) -> Dict[str, Any]:
+    """Return {"route": "local" | "llm", "intents": [...]} for a question"""
+    text = question.lower().strip()
+    if not text or len(text.split()) > MAX_LOOKUP_WORDS or OPEN_ENDED.search(text):
+        return {"route": "llm", "intents": []}
+
+    intents = [name for name, pattern in METRIC_INTENTS if pattern.search(text)]
+    if "high_low" in intents and "price" in intents:
+        # "the low price" asks for the low, not the current price
+        intents.remove("price")
+    if ANALYSIS_INTENT.search(text):
+        intents.append("analysis")
+    if SECTOR_WIDE.search(text) or (TIME_RANGE.search(text) and not RANGE_INTENTS.issuperset(intents)):
+        return {"route": "llm", "intents": []}
+    return {"route": "local" if intents else "llm", "intents": intents}
+
+
+def unknown_terms(question: str, allowed: Iterable[str] = ()) -> List[str]:
+    """Words outside the lookup vocabulary, the allowed names and plain numbers"""
+    allowed = {word.lower() for word in allowed}
+    return [word for word in re.findall(r"[a-z0-9&]+", question.lower())
+            if word not in LOOKUP_WORDS and word not in allowed and not word.isdigit()]
+
+
+def mentioned_tickers(question: str, known_tickers: Iterable[str]) -> List[str]:
+    words = set(re.findall(r"[A-Za-z&]+", question.upper()))
+    return [ticker for ticker in known_tickers if ticker.upper() in words]
+
+
+def mentioned_ticker(question: str, known_tickers: Iterable[str]) -> Optional[str]:
+    tickers = mentioned_tickers(question, known_tickers)
+    return tickers[0] if tickers else None
+
+
+def answer_metric(intent: str, stock_data: Dict[str, Any], analyze: Callable[[Dict[str, Any]], str]) -> str:
+    name = f"{stock_data.get('company_name', stock_data.get('ticker'))} ({stock_data.get('ticker')})"
+    if intent == "analysis":
+        return analyze(stock_data)
+    if intent == "high_low":
+        return f"The high / low for {name} is {stock_data.get('high', 'N/A')} / {stock_data.get('low', 'N/A')}."
+    if intent == "cagr":
+        return (f"{name} has a 1-year CAGR of {stock_data.get('cagr_1yr', 'N/A')}, 5-year CAGR of "
+                f"{stock_data.get('cagr_5yr', 'N/A')} and 10-year CAGR of {stock_data.get('cagr_10yr', 'N/A')}.")
+
+    value = stock_data.get(intent, "N/A")
+    if not value or value == "N/A":
+        return f"The {METRIC_LABELS[intent]} for {name} is not available from Screener.in."
+    return f"The {METRIC_LABELS[intent]} of {name} is {value}."
+
+
+def route_question(question: str, ticker: str, stock_data: Dict[str, Any],
+                   analyze: Callable[[Dict[str, Any]], str],
+                   fetch: Optional[Callable[[str], Dict[str, Any]]] = None,
+                   known_tickers: Iterable[str] = ()) -> Dict[str, Any]:
+    """Answer simple metric lookups locally; everything else is marked for the LLM.
+
+    If the question names a different known ticker, its data is looked up
+    with `fetch` (normally the cached scraper) before answering. Questions
+    naming two or more tickers are comparisons, and questions naming
+    anything we can't identify (e.g. a ticker outside `known_tickers`) might
+    be about another company; both go to the LLM.
+    """
+    started = time.perf_counter()
+    decision = classify(question)
+    decision.update({"ticker": ticker, "answer": None})
+
+    known_tickers = list(known_tickers)
+    names = set(known_tickers) | {ticker}
+    if stock_data and stock_data.get("company_name"):
+        names |= set(re.findall(r"[a-z0-9&]+", str(stock_data["company_name"]).lower()))
+    if decision["route"] == "local" and (len(mentioned_tickers(question, set(known_tickers) | {ticker})) > 1
+                                         or unknown_terms(question, names)):
+        decision.update({"route": "llm", "intents": []})
+
+    if decision["route"] == "local":
+        other = mentioned_ticker(question, [t for t in known_tickers if t != ticker])
+        if other and fetch:
+            stock_data = fetch(other)
+            decision["ticker"] = other
+        if not stock_data or stock_data.get("error"):
+            decision["route"] = "llm"
+        else:
+            answers: List[str] = [answer_metric(intent, stock_data, analyze) for intent in decision["intents"]]
+            decision["answer"] = " ".join(answers)
+
+    decision["latency_ms"] = (time.perf_counter() - started) * 1000
+    return decision
@@ -0,0 +1,180 @@
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+import yfinance as yf
+
+from utils.fetch import SOURCE_BUDGETS
+
+LIVE_INTERVAL = float(os.getenv("FINANCEBOT_LIVE_INTERVAL", "5"))
+MAX_LIVE_POINTS = 500
+
+# Screener-style index tickers mapped to Yahoo symbols
+INDEX_SYMBOLS = {"NIFTY": "^NSEI", "NIFTY50": "^NSEI", "SENSEX": "^BSESN"}
+
+
+def nse_symbol(ticker: str) -> str:
+    """Map a Screener.in ticker to its Yahoo Finance symbol"""
+    ticker = ticker.upper()
+    if ticker in INDEX_SYMBOLS:
+        return INDEX_SYMBOLS[ticker]
+    if ticker.startswith("^") or "." in ticker:
+        return ticker
+    return f"{ticker}.NS"
+
+
+class QuoteFeed(ABC):
+    """Polls quotes, hitting the upstream at most once per interval per symbol"""
+
+    def __init__(self, min_interval: float = LIVE_INTERVAL):
+        self.min_interval = min_interval
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _fetch(self, symbol: str) -> Dict[str, Any]:
+        """Return {"time", "price", "change", "change_percent"} for the symbol"""
+
+    def latest(self, symbol: str) -> Dict[str, Any]:
+        with self._lock:
+            quote = self._latest.get(symbol)
+            if quote and time.monotonic() - quote["polled_at"] < self.min_interval:
+                return quote
+        try:
+            quote = self._fetch(symbol)
+            quote["status"] = "success"
+        except Exception:
+            quote = {"price": 0, "status": "error", "message": "Price data unavailable",
+                     "time": pd.Timestamp.now()}
+        quote["polled_at"] = time.monotonic()
+        with self._lock:
+            self._latest[symbol] = quote
+        return quote
+
+
+class YahooQuoteFeed(QuoteFeed):
+    def _fetch(self, symbol: str) -> Dict[str, Any]:
+        # fast_info fetches without a timeout; the last two daily closes carry the same numbers
+        closes = yf.Ticker(symbol).history(period="5d", timeout=SOURCE_BUDGETS["yahoo"])["Close"].dropna()
+        last_price, previous_close = float(closes.iloc[-1]), float(closes.iloc[-2])
+        return {
+            "time": pd.Timestamp.now(),
+            "price": last_price,
+            "change": last_price - previous_close,
+            "change_percent": (last_price - previous_close) / previous_close * 100,
+        }
+
+
+class SimulatedQuoteFeed(QuoteFeed):
+    """Random-walk quotes for local development and load testing"""
+
+    def __init__(self, min_interval: float = LIVE_INTERVAL, volatility: float = 0.001, seed: int = 42):
+        super().__init__(min_interval)
+        self.volatility = volatility
+        self._rng = random.Random(seed)
+        self._state: Dict[str, Dict[str, float]] = {}
+
+    def seed_price(self, symbol: str, price: float):
+        if symbol not in self._state and price:
+            self._state[symbol] = {"open": float(price), "last": float(price)}
+
+    def _fetch(self, symbol: str) -> Dict[str, Any]:
+        self.seed_price(symbol, 100.0)
+        state = self._state[symbol]
+        state["last"] *= 1 + self._rng.gauss(0, self.volatility)
+        return {
+            "time": pd.Timestamp.now(),
+            "price": state["last"],
+            "change": state["last"] - state["open"],
+            "change_percent": (state["last"] - state["open"]) / state["open"] * 100,
+        }
+
+
+_feed: Optional[QuoteFeed] = None
+_feed_lock = threading.Lock()
+
+
+def get_quote_feed() -> QuoteFeed:
+    """Process-wide feed; set FINANCEBOT_QUOTE_FEED=sim to use the simulator"""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            if os.getenv("FINANCEBOT_QUOTE_FEED", "yahoo").lower() == "sim":
+                _feed = SimulatedQuoteFeed()
+            else:
+                _feed = YahooQuoteFeed()
+        return _feed
+
+
+def record_cpu(key: str, started: float, keep: int = 20) -> float:
+    """Store the CPU milliseconds spent since `started` (from time.thread_time)"""
+    elapsed = (time.thread_time() - started) * 1000
+    samples = st.session_state.setdefault(key, [])
+    samples.append(elapsed)
+    del samples[:-keep]
+    return elapsed
+
+
+def mean_cpu(key: str) -> Optional[float]:
+    samples = st.session_state.get(key)
+    return sum(samples) / len(samples) if samples else None
+
+
+def cpu_caption():
+    """Compare live-update CPU against the last full script runs"""
+    live, full = mean_cpu("live_cpu_ms"), mean_cpu("full_run_cpu_ms")
+    if live is not None and full:
+        st.caption(f"Live update CPU {live:.1f} ms vs full rerun {full:.1f} ms ({full / max(live, 0.01):.0f}x)")
+
+
+def history_id(history: Optional[pd.DataFrame]) -> Optional[tuple]:
+    """Cheap fingerprint of a history frame: its length and first and last dates"""
+    if history is None or history.empty:
+        return None
+    dates = history['Date']
+    return len(history), str(dates.iloc[0]), str(dates.iloc[-1])
+
+
+def render_live_metric(symbol: str, feed: QuoteFeed, label: str = "Current Price", prefix: str = "$"):
+    quote = feed.latest(symbol)
+    if quote["status"] == "success":
+        st.metric(label, f"{prefix}{quote['price']:.2f}", f"{quote['change_percent']:.2f}%")
+    return quote
+
+
+def render_live_chart(symbol: str, feed: QuoteFeed, key: str, history: Optional[pd.DataFrame] = None,
+                      title: str = ""):
+    """Append the latest quote to a figure kept in session state and redraw it.
+
+    The figure is built once per symbol and history (e.g. timeframe); later
+    updates only extend the trace.
+    """
+    state_key = f"live_fig_{key}"
+    entry = st.session_state.get(state_key)
+    hist_id = history_id(history)
+    if entry is None or entry["symbol"] != symbol or entry["history_id"] != hist_id:
+        fig = go.Figure()
+        x, y = [], []
+        if history is not None and not history.empty:
+            x, y = list(history['Date'][-MAX_LIVE_POINTS:]), list(history['Close'][-MAX_LIVE_POINTS:])
+        fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name='Price', line=dict(color='#4169E1', width=2)))
+        fig.update_layout(title=title, template="plotly_white", height=350,
+                          margin=dict(l=0, r=0, t=40, b=0), xaxis=dict(type="date"))
+        entry = {"symbol": symbol, "history_id": hist_id, "fig": fig, "last_time": None}
+        st.session_state[state_key] = entry
+
+    quote = feed.latest(symbol)
+    if quote["status"] == "success" and quote["time"] != entry["last_time"]:
+        trace = entry["fig"].data[0]
+        with entry["fig"].batch_update():
+            trace.x = (tuple(trace.x) + (quote["time"],))[-MAX_LIVE_POINTS:]
+            trace.y = (tuple(trace.y) + (quote["price"],))[-MAX_LIVE_POINTS:]
+        entry["last_time"] = quote["time"]
+
+    st.plotly_chart(entry["fig"], use_container_width=True, key=state_key)